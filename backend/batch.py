@@ -0,0 +1,259 @@
+"""
+Several logical queries answered in one request.
+
+A gender page needs the gender's Pokemon, the types among them, their role
+breakdown and possibly a type filter; asked separately, every one of those
+calls re-fetches the same gender listing and the same Pokemon. A batch
+resolves all of its queries against one `SharedHydration`, so each listing
+and each Pokemon is fetched at most once per batch, however many queries use it.
+
+The GET routes for these listings are answered by the same resolvers
+(over a hydration of their own), so each query kind has one implementation.
+"""
+
+import asyncio
+import json
+from typing import Literal
+
+import httpx
+from pydantic import BaseModel, Field
+
+from .common import (
+    DEFAULT_ROLES,
+    POKEMON_LIMIT,
+    POKEMON_MAX_LIMIT,
+    api_url_build,
+    decode_cursor,
+    encode_cursor,
+)
+from .deadlines import BudgetExhausted, is_partial, mark_partial
+from .cache import get_response_cache
+from .helper_functions import (
+    categorize_pokemon_roles,
+    fan_out,
+    fetch_json,
+    fetch_pokemon_data,
+    fetch_pokemon_many,
+    run_in_background,
+)
+from .indexes import get_pokedex_index
+from .records import ROLE_FIELDS, PokemonRef, dump_records, needs_hydration, parse_fields
+
+# How many of a gender's Pokemon /available-types and /pokemon-roles look at
+SAMPLE_SIZE = 20
+
+
+class BatchQuery(BaseModel):
+    """One logical query; `kind` names the GET route it stands in for."""
+
+    kind: Literal["pokemon-by-gender", "filter-by-type", "available-types", "pokemon-roles"]
+    gender: str
+    type: str | None = None
+    limit: int = Field(POKEMON_LIMIT, ge=1, le=POKEMON_MAX_LIMIT)
+    cursor: str | None = None
+    fields: str | None = None
+
+
+class BatchRequest(BaseModel):
+    """Queries keyed by a caller-chosen name; results come back under the same names."""
+
+    queries: dict[str, BatchQuery] = Field(max_length=16)
+
+
+class SharedHydration:
+    """
+    Fetches listings and Pokemon for one batch, each at most once.
+
+    Queries running concurrently that ask for the same URL await the same
+    fetch, so overlapping queries cost one set of upstream work.
+    """
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self._listings = {}
+        self._pokemon = {}
+
+    async def listing(self, url: str, resource: str) -> dict:
+        """
+        Args:
+            url: Listing URL to fetch
+            resource: What the listing is (e.g. "gender"), for the error message
+
+        Raises:
+            LookupError: If the upstream request fails, naming `resource`
+            BudgetExhausted: If the request's budget runs out first
+        """
+        if url not in self._listings:
+            self._listings[url] = asyncio.ensure_future(fetch_json(self.client, url))
+        try:
+            return await asyncio.shield(self._listings[url])
+        except BudgetExhausted:
+            raise
+        except httpx.HTTPError:
+            raise LookupError(f"Failed to fetch {resource} data") from None
+
+    async def pokemon(self, urls: list[str]) -> list:
+        """returns the Pokemon for `urls` that could be fetched, in order"""
+        missing = [url for url in dict.fromkeys(urls) if url not in self._pokemon]
+        if missing:
+            # One fan-out for everything not already fetched or in flight
+            hydrated = asyncio.ensure_future(self._hydrate(missing))
+            for url in missing:
+                self._pokemon[url] = hydrated
+
+        records = []
+        for url in urls:
+            record = (await asyncio.shield(self._pokemon[url])).get(url)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def prefetch(self, urls: list[str]):
+        """Warms the response cache with `urls` in the background, e.g. a listing's next page."""
+        if urls and get_response_cache() is not None:
+            run_in_background(fetch_pokemon_many(self.client, urls))
+
+    async def _hydrate(self, urls: list[str]) -> dict:
+        async def hydrate(url):
+            record = await fetch_pokemon_data(self.client, url)
+            return (url, record) if record is not None else None
+
+        return dict(await fan_out(urls, hydrate))
+
+    async def gender_names(self, gender: str) -> list[str]:
+        """
+        Raises:
+            LookupError: If the gender listing can't be fetched
+        """
+        gender_data = await self.listing(api_url_build("gender", gender), "gender")
+        return [entry["pokemon_species"]["name"] for entry in gender_data.get("pokemon_species_details", [])]
+
+
+def pokemon_urls(pokemon_names: list[str]) -> list[str]:
+    return [api_url_build("pokemon", name) for name in pokemon_names]
+
+
+def page_result(records: list, fields: tuple, offset: int, limit: int, total: int):
+    next_cursor = encode_cursor(offset + limit) if offset + limit < total else None
+    return dump_records(records, fields), next_cursor
+
+
+async def pokemon_by_gender(hydration: SharedHydration, query: BatchQuery):
+    offset = decode_cursor(query.cursor)
+    selected = parse_fields(query.fields)
+
+    index = get_pokedex_index()
+    if index is not None:
+        if query.gender not in index.by_gender:
+            raise LookupError("Failed to fetch gender data")
+        pokemon_list = index.records(index.query(gender=query.gender))
+        return page_result(pokemon_list[offset:offset + query.limit], selected, offset, query.limit, len(pokemon_list))
+
+    pokemon_names = await hydration.gender_names(query.gender)
+    page_names = pokemon_names[offset:offset + query.limit]
+    if not needs_hydration(selected):
+        pokemon_list = [PokemonRef(name) for name in page_names]
+    else:
+        pokemon_list = await hydration.pokemon(pokemon_urls(page_names))
+        hydration.prefetch(pokemon_urls(pokemon_names[offset + query.limit:offset + 2 * query.limit]))
+    return page_result(pokemon_list, selected, offset, query.limit, len(pokemon_names))
+
+
+async def filter_by_type(hydration: SharedHydration, query: BatchQuery):
+    offset = decode_cursor(query.cursor)
+    selected = parse_fields(query.fields)
+    if not query.type:
+        raise ValueError("filter-by-type needs a type")
+    type_choice = query.type.lower()
+
+    index = get_pokedex_index()
+    if index is not None:
+        if query.gender not in index.by_gender:
+            raise LookupError("Failed to fetch gender data")
+        filtered_list = index.records(index.query(gender=query.gender, type_name=type_choice))
+        return page_result(filtered_list[offset:offset + query.limit], selected, offset, query.limit, len(filtered_list))
+
+    # Like the route, the cursor walks the gender listing, so a page can hold fewer than `limit` matches
+    pokemon_names = await hydration.gender_names(query.gender)
+    pokemon_list = await hydration.pokemon(pokemon_urls(pokemon_names[offset:offset + query.limit]))
+    hydration.prefetch(pokemon_urls(pokemon_names[offset + query.limit:offset + 2 * query.limit]))
+    filtered_list = [pokemon for pokemon in pokemon_list if pokemon.has_type(type_choice)]
+    return page_result(filtered_list, selected, offset, query.limit, len(pokemon_names))
+
+
+async def available_types(hydration: SharedHydration, query: BatchQuery):
+    index = get_pokedex_index()
+    if index is not None:
+        if query.gender not in index.by_gender:
+            raise LookupError("Failed to fetch gender data")
+        return json.dumps(index.keys_overlapping(index.by_type, index.query(gender=query.gender)), separators=(",", ":")).encode(), None
+
+    pokemon_names = await hydration.gender_names(query.gender)
+    types = set()
+    for pokemon in await hydration.pokemon(pokemon_urls(pokemon_names[:SAMPLE_SIZE])):
+        types.update(pokemon.types)
+    return json.dumps(sorted(types), separators=(",", ":")).encode(), None
+
+
+async def pokemon_roles(hydration: SharedHydration, query: BatchQuery):
+    selected = parse_fields(query.fields, default=ROLE_FIELDS)
+
+    pokemon_names = await hydration.gender_names(query.gender)
+    pokemon_list = await hydration.pokemon(pokemon_urls(pokemon_names[:SAMPLE_SIZE]))
+    roles = await categorize_pokemon_roles([pokemon.stats for pokemon in pokemon_list])
+
+    role_categories = {role: [] for role in DEFAULT_ROLES}
+    for pokemon, role in zip(pokemon_list, roles):
+        role_categories[role].append(pokemon.to_dict(selected))
+    return json.dumps(role_categories, separators=(",", ":")).encode(), None
+
+
+# What each query kind answers with when the request budget ran out before its listing arrived
+EMPTY_RESULTS = {
+    "pokemon-by-gender": b"[]",
+    "filter-by-type": b"[]",
+    "available-types": b"[]",
+    "pokemon-roles": json.dumps({role: [] for role in DEFAULT_ROLES}, separators=(",", ":")).encode(),
+}
+
+RESOLVERS = {
+    "pokemon-by-gender": pokemon_by_gender,
+    "filter-by-type": filter_by_type,
+    "available-types": available_types,
+    "pokemon-roles": pokemon_roles,
+}
+
+
+async def resolve(hydration: SharedHydration, query: BatchQuery):
+    """returns (JSON body, next page cursor or None) for one query, with failures as an `{"error": ...}` body"""
+    query = query.model_copy(update={"gender": query.gender.lower()})
+    try:
+        return await RESOLVERS[query.kind](hydration, query)
+    except (ValueError, LookupError) as e:
+        return json.dumps({"error": str(e)}).encode(), None
+    except BudgetExhausted:
+        # Out of time, not an upstream failure: an empty answer, marked partial
+        mark_partial()
+        return EMPTY_RESULTS[query.kind], None
+    except httpx.HTTPError:
+        # Listing failures arrive as LookupErrors naming their resource; anything else came from Pokemon fetches
+        return json.dumps({"error": "Failed to fetch Pokemon data"}).encode(), None
+
+
+async def run_batch(client: httpx.AsyncClient, batch: BatchRequest) -> bytes:
+    """
+    Resolves every query of a batch concurrently over one shared hydration.
+
+    Returns:
+        bytes: `{"results": {name: result}, "next_cursors": {name: cursor}}`
+            as JSON, with a cursor only for listings that have a next page,
+            and `"partial": true` if the request budget cut any query short
+    """
+    hydration = SharedHydration(client)
+    names = list(batch.queries)
+    answers = await asyncio.gather(*(resolve(hydration, batch.queries[name]) for name in names))
+
+    results = b",".join(json.dumps(name).encode() + b":" + body for name, (body, _) in zip(names, answers))
+    next_cursors = {name: cursor for name, (_, cursor) in zip(names, answers) if cursor is not None}
+    partial = b',"partial":true' if is_partial() else b""
+    return b'{"results":{' + results + b'},"next_cursors":' + json.dumps(next_cursors).encode() + partial + b"}"
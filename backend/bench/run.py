@@ -0,0 +1,310 @@
+"""
+End-to-end benchmark for every route in backend/main.py.
+
+Drives the backend at a fixed concurrency and reports, per route, requests
+per second, p50/p95/p99 latency and how many upstream calls each request
+cost (read from the stand-in's /__stats, once it has gone quiet after the
+backend's startup warm-up). With --spawn it starts the stand-in and the
+backend itself, with the backend's periodic background jobs switched off so
+they don't count towards any route:
+
+    python -m backend.bench.run --spawn --snapshot backend/.cache/snapshot.json.gz --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+ROUTES = [
+    "/pokemon-by-gender/{gender}",
+    "/pokemon-by-type/{type}",
+    "/pokemon-by-gender/{gender}/filter/{type}",
+    "/available-types/{gender}",
+    "/pokemon-roles/{gender}",
+    "/available-abilities/{type}",
+    "/pokemon-by-type/{type}/filter/{ability}",
+    "/pokemon-by-time",
+    "/stream/pokemon-by-gender/{gender}",
+    "/stream/pokemon-by-type/{type}",
+    "POST /batch",
+    "/similar/{pokemon}",
+    "/similar?names={pokemon},{other_pokemon}",
+    "/role-stats",
+    "/role-stats/percentiles",
+    "/role-stats/by-type",
+    "/sprites/pokemon/{sprite_id}.png",
+    "/cache/stats",
+    "/metrics",
+]
+
+# Request bodies of the routes that take one, formatted like the route
+BODIES = {
+    "POST /batch": {
+        "queries": {
+            "types": {"kind": "available-types", "gender": "{gender}"},
+            "roles": {"kind": "pokemon-roles", "gender": "{gender}"},
+            "page": {"kind": "pokemon-by-gender", "gender": "{gender}"},
+            "filtered": {"kind": "filter-by-type", "gender": "{gender}", "type": "{type}"},
+        }
+    },
+}
+
+# Smallest valid PNG, standing in for sprites in a spawned backend's sprite cache
+PLACEHOLDER_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+async def upstream_calls(client: httpx.AsyncClient, standin_url: str):
+    if not standin_url:
+        return None
+    response = await client.get(f"{standin_url}/__stats")
+    return response.json()["total"]
+
+
+def format_body(body, params: dict):
+    if isinstance(body, dict):
+        return {key: format_body(value, params) for key, value in body.items()}
+    return body.format(**params) if isinstance(body, str) else body
+
+
+def build_request(route: str, params: dict) -> tuple:
+    """returns (method, url, JSON body or None) for a ROUTES entry"""
+    method, _, path = route.rpartition(" ")
+    return method or "GET", path.format(**params), format_body(BODIES.get(route), params)
+
+
+async def wait_until_quiet(client: httpx.AsyncClient, standin_url: str, quiet: float = 1.0, timeout: float = 120):
+    """Waits until the stand-in has seen no calls for `quiet` seconds, i.e. the backend's warm-up is over."""
+    if not standin_url:
+        return
+    deadline = time.time() + timeout
+    calls = await upstream_calls(client, standin_url)
+    while time.time() < deadline:
+        await asyncio.sleep(quiet)
+        now = await upstream_calls(client, standin_url)
+        if now == calls:
+            return
+        calls = now
+    console.print("[yellow]Upstream never went quiet; upstream/req includes background calls[/yellow]")
+
+
+async def bench_route(
+    client: httpx.AsyncClient, method: str, url: str, body, requests: int, concurrency: int, standin_url: str
+) -> dict:
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                await response.aread()
+                if response.status_code != 200 or response.content.startswith(b'{"error"'):
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    calls_before = await upstream_calls(client, standin_url)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    calls_after = await upstream_calls(client, standin_url)
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "upstream_calls_per_request": (
+            (calls_after - calls_before) / requests if calls_before is not None else None
+        ),
+    }
+
+
+async def run_benchmark(args) -> dict:
+    params = {
+        "gender": args.gender,
+        "type": args.type,
+        "ability": args.ability,
+        "pokemon": args.pokemon,
+        "other_pokemon": args.other_pokemon,
+        "sprite_id": args.sprite_id,
+    }
+    routes = [route for route in ROUTES if not args.routes or route in args.routes]
+
+    results = {}
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        await wait_until_quiet(client, args.standin_url)
+        for route in routes:
+            method, url, body = build_request(route, params)
+            # One untimed request so cold-start cost doesn't land on the first percentile
+            if args.warmup:
+                await client.request(method, url, json=body)
+            results[route] = await bench_route(
+                client, method, url, body, args.requests, args.concurrency, args.standin_url
+            )
+            console.print(f"[dim]{route}: {results[route]['rps']:.1f} req/s[/dim]")
+
+    return {
+        "created_at": time.time(),
+        "config": {
+            "base_url": args.base_url,
+            "standin_url": args.standin_url,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "params": params,
+        },
+        "routes": results,
+    }
+
+
+def print_report(report: dict):
+    table = Table(title="Benchmark results")
+    for column in ("Route", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors", "upstream/req"):
+        table.add_column(column, justify="left" if column == "Route" else "right")
+    for route, result in report["routes"].items():
+        upstream = result["upstream_calls_per_request"]
+        table.add_row(
+            route,
+            f"{result['rps']:.1f}",
+            f"{result['p50_ms']:.1f}",
+            f"{result['p95_ms']:.1f}",
+            f"{result['p99_ms']:.1f}",
+            str(result["errors"]),
+            "-" if upstream is None else f"{upstream:.2f}",
+        )
+    console.print(table)
+
+
+def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def spawn_servers(args) -> list:
+    """Starts the stand-in and a backend pointed at it; returns the processes."""
+    repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    standin = subprocess.Popen(
+        [
+            sys.executable, "-m", "backend.bench.standin",
+            "--snapshot", args.snapshot,
+            "--port", str(args.standin_port),
+            "--latency-ms", str(args.latency_ms),
+            "--jitter-ms", str(args.jitter_ms),
+            "--error-rate", str(args.error_rate),
+        ],
+        cwd=repo_root,
+    )
+    # A throwaway response cache, so every run starts cold whatever earlier runs cached;
+    # sprites come from GitHub, not the stand-in, so a placeholder is served from a throwaway sprite cache
+    scratch = tempfile.mkdtemp(prefix="pokeflow-bench-")
+    sprite_cache = os.path.join(scratch, "sprites")
+    os.makedirs(os.path.join(sprite_cache, "pokemon"))
+    with open(os.path.join(sprite_cache, "pokemon", f"{args.sprite_id}.png"), "wb") as f:
+        f.write(PLACEHOLDER_PNG)
+
+    env = dict(
+        os.environ,
+        POKEFLOW_BASE_URL=f"http://127.0.0.1:{args.standin_port}/api/v2/",
+        POKEFLOW_CACHE_PATH=os.path.join(scratch, "responses.sqlite3"),
+        POKEFLOW_SPRITE_CACHE=sprite_cache,
+        # Periodic background jobs would land their upstream calls on whichever route is running
+        POKEFLOW_REFRESH_INTERVAL=str(10 ** 9),
+        POKEFLOW_TIME_POOL_REFRESH_INTERVAL=str(10 ** 9),
+        POKEFLOW_ROLE_STATS_HYDRATE="0",
+    )
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(args.backend_port), "--log-level", "warning"],
+        cwd=repo_root,
+        env=env,
+    )
+    args.standin_url = f"http://127.0.0.1:{args.standin_port}"
+    args.base_url = f"http://127.0.0.1:{args.backend_port}"
+    wait_until_up(f"{args.standin_url}/__stats")
+    wait_until_up(f"{args.base_url}/cache/stats")
+    return [backend, standin]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.bench.run", description="Benchmark every backend route.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Backend under test")
+    parser.add_argument("--standin-url", default=None, help="Stand-in to read upstream call counts from")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--routes", nargs="*", choices=ROUTES, help="Only benchmark these routes")
+    parser.add_argument("--gender", default="female")
+    parser.add_argument("--type", default="fire")
+    parser.add_argument("--ability", default="blaze")
+    parser.add_argument("--pokemon", default="pikachu", help="Pokemon for /similar")
+    parser.add_argument("--other-pokemon", default="charizard", help="Second Pokemon for batch /similar")
+    parser.add_argument("--sprite-id", type=int, default=25, help="Pokemon id for /sprites")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--output", default="bench.json", help="Where to write the JSON report")
+    parser.add_argument("--spawn", action="store_true", help="Start the stand-in and backend for the run")
+    parser.add_argument("--snapshot", help="Snapshot the spawned stand-in serves")
+    parser.add_argument("--standin-port", type=int, default=8100)
+    parser.add_argument("--backend-port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args(argv)
+
+    if args.spawn and not args.snapshot:
+        parser.error("--spawn needs --snapshot")
+
+    processes = spawn_servers(args) if args.spawn else []
+    try:
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    console.print(f"[bold green]Report written:[/bold green] {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Local PokeAPI stand-in for benchmarks and offline testing.
+
+Serves the resources recorded in a snapshot (see backend.snapshot) under the
+same URL layout as pokeapi.co, with ETags (answering If-None-Match with 304
+like pokeapi.co's CDN does) and optional injected latency and errors:
+
+    python -m backend.bench.standin --snapshot backend/.cache/snapshot.json.gz --latency-ms 40 --error-rate 0.01
+
+Point the backend at it with POKEFLOW_BASE_URL=http://127.0.0.1:8100/api/v2/
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from collections import Counter
+
+from fastapi import FastAPI, Request, Response
+
+from ..common import cache_uri_build
+from ..snapshot import Snapshot
+
+API_PREFIX = "/api/v2/"
+
+
+def create_standin_app(
+    snapshot: Snapshot,
+    latency_ms: float = 0,
+    jitter_ms: float = 0,
+    error_rate: float = 0,
+    tail_rate: float = 0,
+    tail_ms: float = 0,
+) -> FastAPI:
+    """
+    Builds the stand-in app.
+
+    Args:
+        snapshot: Recorded resources to serve
+        latency_ms: Delay added to every response
+        jitter_ms: Extra uniformly random delay on top of `latency_ms`
+        error_rate: Fraction of requests answered with a 503
+        tail_rate: Fraction of requests delayed by a further `tail_ms`, a slow tail
+        tail_ms: Extra delay of the slow tail
+    """
+    app = FastAPI()
+    app.state.calls = Counter()
+    app.state.not_modified = 0
+
+    def rewrite(data, own_base: str) -> bytes:
+        # Listings embed absolute URLs; point them back at the stand-in
+        return json.dumps(data, separators=(",", ":")).replace(snapshot.base_url, own_base).encode()
+
+    def respond(body: bytes, request: Request) -> Response:
+        etag = '"{}"'.format(hashlib.blake2b(body, digest_size=16).hexdigest())
+        if request.headers.get("if-none-match") == etag:
+            app.state.not_modified += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type="application/json", headers={"ETag": etag})
+
+    @app.get("/__stats")
+    async def stats():
+        """Upstream calls served so far, by endpoint."""
+        return {
+            "total": sum(app.state.calls.values()),
+            "by_endpoint": dict(app.state.calls),
+            "not_modified": app.state.not_modified,
+        }
+
+    @app.post("/__reset")
+    async def reset():
+        app.state.calls.clear()
+        app.state.not_modified = 0
+        return {"reset": True}
+
+    @app.get(API_PREFIX + "{path:path}")
+    async def serve(path: str, request: Request):
+        parts = [part for part in path.split("/") if part]
+        if not parts:
+            return Response(status_code=404)
+
+        endpoint = parts[0]
+        app.state.calls[endpoint] += 1
+
+        delay = latency_ms + random.uniform(0, jitter_ms)
+        if tail_rate and random.random() < tail_rate:
+            delay += tail_ms
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if error_rate and random.random() < error_rate:
+            return Response(status_code=503)
+
+        own_base = str(request.base_url) + API_PREFIX.lstrip("/")
+        if len(parts) == 1:
+            offset = int(request.query_params.get("offset", 0))
+            limit = int(request.query_params.get("limit", 20))
+            keys = snapshot.keys(endpoint)
+            results = [
+                {"name": snapshot.resources[key]["name"], "url": snapshot.base_url + key}
+                for key in keys[offset:offset + limit]
+            ]
+            body = {"count": len(keys), "next": None, "previous": None, "results": results}
+            return respond(rewrite(body, own_base), request)
+
+        try:
+            data = snapshot.get(cache_uri_build(endpoint, *parts[1:3]))
+        except ValueError:
+            data = None
+        if data is None:
+            return Response(status_code=404)
+        return respond(rewrite(data, own_base), request)
+
+    return app
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="python -m backend.bench.standin", description="Serve a snapshot as a local PokeAPI.")
+    parser.add_argument("--snapshot", required=True, help="Snapshot file written by backend.snapshot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Extra random delay, up to this much")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with a 503")
+    parser.add_argument("--tail-rate", type=float, default=0, help="Fraction of requests delayed by --tail-ms more")
+    parser.add_argument("--tail-ms", type=float, default=0, help="Extra delay of the slow tail")
+    args = parser.parse_args(argv)
+
+    app = create_standin_app(
+        Snapshot.load(args.snapshot), args.latency_ms, args.jitter_ms, args.error_rate, args.tail_rate, args.tail_ms
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from .common import (
+    CACHE_ENABLED,
+    CACHE_FRESH_TTL,
+    CACHE_MAX_AGE,
+    CACHE_MEMORY_SIZE,
+    CACHE_MMAP_SIZE,
+    CACHE_PATH,
+    CACHE_SHARED,
+    CACHE_SHARED_MEMORY_SIZE,
+    HTTP_TIMEOUT,
+)
+
+
+class LRUCache:
+    """Size-bounded in-memory cache with a per-entry TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get_entry(self, key: str):
+        """returns (value, stored_at, validators) or None when missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if time.time() - entry[1] > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: str, value, stored_at: float = None, validators: dict = None):
+        self._entries[key] = (value, stored_at or time.time(), validators)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def values(self, prefix: str):
+        """yields every unexpired value whose key starts with `prefix`, leaving the LRU order alone"""
+        oldest = time.time() - self.ttl
+        for key, (value, stored_at, _) in list(self._entries.items()):
+            if key.startswith(prefix) and stored_at >= oldest:
+                yield value
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskStore:
+    """
+    Persistent key/value store backed by a single SQLite file.
+
+    The file can be shared by several processes. It runs in WAL mode, so
+    readers never wait on a writer and commits don't fsync, and is read
+    through mmap, so its pages are held once in the OS page cache rather
+    than copied into every process.
+
+    Every thread gets its own connection, so writes can be handed to worker
+    threads (see `TieredCache.aset`) while the event loop keeps reading.
+    """
+
+    def __init__(self, path: str, ttl: float, mmap_size: int = CACHE_MMAP_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.mmap_size = mmap_size
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, "
+            "etag TEXT, last_modified TEXT)"
+        )
+        # Bumped by every invalidation, so other processes know to drop their memory tier
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        # Which process is fetching a key right now, until when
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fills (key TEXT PRIMARY KEY, owner INTEGER NOT NULL, expires REAL NOT NULL)"
+        )
+        # Stores created before validators were kept
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(entries)")}
+        for column in ("etag", "last_modified"):
+            if column not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE entries ADD COLUMN {column} TEXT")
+                except sqlite3.OperationalError:
+                    # Another worker migrated it first
+                    pass
+        self._conn.commit()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """returns the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Waits out another process's write instead of failing with "database is locked"
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def get_entry(self, key: str):
+        """returns (value, stored_at, validators) or None when missing or expired"""
+        row = self._conn.execute(
+            "SELECT value, stored_at, etag, last_modified FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, stored_at, etag, last_modified = row
+        if time.time() - stored_at > self.ttl:
+            # Left for `delete_expired`, so a read never has to wait for the write lock
+            return None
+
+        validators = {"etag": etag, "last_modified": last_modified} if etag or last_modified else None
+        return json.loads(value), stored_at, validators
+
+    def set(self, key: str, value, stored_at: float = None, validators: dict = None):
+        validators = validators or {}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, stored_at, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+            (
+                key,
+                json.dumps(value, separators=(",", ":")),
+                stored_at or time.time(),
+                validators.get("etag"),
+                validators.get("last_modified"),
+            ),
+        )
+        self._conn.commit()
+
+    def values(self, prefix: str):
+        """yields every unexpired value whose key starts with `prefix`"""
+        rows = self._conn.execute(
+            "SELECT value FROM entries WHERE substr(key, 1, ?) = ? AND stored_at >= ?",
+            (len(prefix), prefix, time.time() - self.ttl),
+        ).fetchall()
+        for (value,) in rows:
+            yield json.loads(value)
+
+    def delete(self, key: str):
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def delete_expired(self) -> int:
+        """Drops every entry older than the TTL; returns how many there were."""
+        cursor = self._conn.execute("DELETE FROM entries WHERE stored_at < ?", (time.time() - self.ttl,))
+        self._conn.commit()
+        return cursor.rowcount
+
+    def delete_prefix(self, prefix: str):
+        self._conn.execute(
+            "DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+        self._conn.commit()
+
+    def clear(self):
+        self._conn.execute("DELETE FROM entries")
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def data_version(self) -> int:
+        """returns a number that changes whenever another connection commits to the file"""
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def generation(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()
+        return row[0] if row is not None else 0
+
+    def bump_generation(self) -> int:
+        """Records an invalidation for other processes to see; returns the new generation."""
+        self._conn.execute(
+            "INSERT INTO meta (name, value) VALUES ('generation', 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+        )
+        self._conn.commit()
+        return self.generation()
+
+    def claim(self, key: str, seconds: float) -> bool:
+        """
+        Takes the lease to fetch `key` for `seconds`, unless another process holds an unexpired one.
+
+        Returns:
+            bool: Whether this process got the lease
+        """
+        now = time.time()
+        cursor = self._conn.execute(
+            "INSERT INTO fills (key, owner, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE fills.expires < ?",
+            (key, os.getpid(), now + seconds, now),
+        )
+        self._conn.commit()
+        return cursor.rowcount == 1
+
+    def release(self, key: str):
+        self._conn.execute("DELETE FROM fills WHERE key = ? AND owner = ?", (key, os.getpid()))
+        self._conn.commit()
+
+    def claimed(self, key: str) -> bool:
+        """returns whether some process holds an unexpired lease on `key`"""
+        row = self._conn.execute("SELECT 1 FROM fills WHERE key = ? AND expires >= ?", (key, time.time())).fetchone()
+        return row is not None
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of a persistent on-disk store.
+
+    Keys are the paths produced by `cache_uri_build` (e.g. "pokemon/pikachu/").
+    Disk hits are promoted into memory so hot keys never touch SQLite.
+    Entries older than `fresh_ttl` are still returned but count as stale,
+    so callers can serve them and refresh in the background. Lookups are
+    tallied per key so the hottest keys can be refreshed proactively.
+    Each entry can carry the upstream validators (ETag / Last-Modified) it
+    was served with, so refreshes can be conditional GETs.
+
+    With `shared` on, the disk tier is shared with other worker processes:
+    the memory tier is dropped when another worker invalidates, a stale
+    memory entry is first checked against the disk tier in case another
+    worker already refreshed it, and a key being fetched by another worker
+    can be waited for (see `claim_fill`) rather than fetched again.
+
+    Every write to the disk tier (`aset`, `arevalidate`, the fill leases,
+    `invalidate` and `purge_expired`) runs in a worker thread: with other
+    workers writing, a write can wait up to the SQLite busy timeout, and
+    that must not stall the event loop. Reads never write; expired disk
+    entries are only skipped until `purge_expired` drops them.
+    """
+
+    def __init__(self, memory: LRUCache, disk: DiskStore = None, fresh_ttl: float = CACHE_FRESH_TTL, shared: bool = False):
+        self.memory = memory
+        self.disk = disk
+        self.fresh_ttl = fresh_ttl
+        self.shared = shared and disk is not None
+        self._data_version = None
+        self._generation = disk.generation() if self.shared else 0
+        self.requests = Counter()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.hits_stale = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.fills_shared = 0
+
+    def _sync(self):
+        """Drops the memory tier if another worker invalidated entries since we last looked."""
+        data_version = self.disk.data_version()
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        generation = self.disk.generation()
+        if generation != self._generation:
+            self._generation = generation
+            self.memory.clear()
+
+    def get_entry(self, key: str):
+        """returns (value, stored_at, validators) or None on a miss"""
+        self.requests[key] += 1
+        if self.shared:
+            self._sync()
+
+        entry = self.memory.get_entry(key)
+        if entry is not None and self.shared and self.is_stale(entry[1]):
+            # Another worker may have refreshed it already
+            entry = self.newer_entry(key, entry[1]) or entry
+        if entry is not None:
+            self.hits_memory += 1
+        elif self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                self.memory.set(key, *entry)
+                self.hits_disk += 1
+
+        if entry is None:
+            self.misses += 1
+        elif self.is_stale(entry[1]):
+            self.hits_stale += 1
+        return entry
+
+    def get(self, key: str):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def peek_entry(self, key: str):
+        """returns (value, stored_at, validators) without counting a lookup, or None if it isn't cached"""
+        if self.shared:
+            # Other workers write straight to disk, so it has the latest copy
+            return self.disk.get_entry(key)
+        entry = self.memory.get_entry(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get_entry(key)
+        return entry
+
+    def newer_entry(self, key: str, stored_after: float):
+        """returns the disk tier's entry for `key` if it was stored after `stored_after` (promoting it), else None"""
+        if self.disk is None:
+            return None
+        entry = self.disk.get_entry(key)
+        if entry is None or entry[1] <= stored_after:
+            return None
+        self.memory.set(key, *entry)
+        return entry
+
+    async def claim_fill(self, key: str, seconds: float = HTTP_TIMEOUT) -> bool:
+        """
+        Claims the upstream fetch of `key` across workers, for at most `seconds`.
+
+        Returns:
+            bool: True if this worker should fetch it, False if another worker
+                already is (its answer will land in the shared disk tier)
+        """
+        if not self.shared:
+            return True
+        return await asyncio.to_thread(self.disk.claim, key, seconds)
+
+    async def release_fill(self, key: str):
+        if self.shared:
+            await asyncio.to_thread(self.disk.release, key)
+
+    def filling(self, key: str) -> bool:
+        """returns whether another worker is still fetching `key`"""
+        return self.shared and self.disk.claimed(key)
+
+    def peek_stored_at(self, key: str):
+        """returns when `key` was stored, without counting a lookup, or None if it isn't cached"""
+        entry = self.peek_entry(key)
+        return entry[1] if entry is not None else None
+
+    def is_stale(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.fresh_ttl
+
+    def hot_keys(self, n: int) -> list[str]:
+        return [key for key, _ in self.requests.most_common(n)]
+
+    def decay_requests(self):
+        """Halves every lookup tally so "hot" tracks recent traffic."""
+        self.requests = Counter({key: count // 2 for key, count in self.requests.items() if count > 1})
+
+    def set(self, key: str, value, validators: dict = None):
+        stored_at = time.time()
+        self.memory.set(key, value, stored_at, validators)
+        if self.disk is not None:
+            self.disk.set(key, value, stored_at, validators)
+
+    async def aset(self, key: str, value, validators: dict = None):
+        """Like `set`, writing the disk tier from a worker thread."""
+        stored_at = time.time()
+        self.memory.set(key, value, stored_at, validators)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value, stored_at, validators)
+
+    async def arevalidate(self, key: str, value, validators: dict = None):
+        """Marks a cached entry fresh again after upstream answered 304 Not Modified."""
+        self.revalidated += 1
+        await self.aset(key, value, validators)
+
+    async def invalidate(self, key: str = None, prefix: str = None):
+        """Drops one key, every key under a prefix, or everything if neither is given."""
+        if key is not None:
+            self.memory.delete(key)
+            if self.disk is not None:
+                await asyncio.to_thread(self.disk.delete, key)
+        elif prefix is not None:
+            self.memory.delete_prefix(prefix)
+            if self.disk is not None:
+                await asyncio.to_thread(self.disk.delete_prefix, prefix)
+        else:
+            self.memory.clear()
+            if self.disk is not None:
+                await asyncio.to_thread(self.disk.clear)
+        if self.shared:
+            self._generation = await asyncio.to_thread(self.disk.bump_generation)
+
+    async def purge_expired(self) -> int:
+        """Drops expired entries from the disk tier; returns how many there were."""
+        if self.disk is None:
+            return 0
+        return await asyncio.to_thread(self.disk.delete_expired)
+
+    def values(self, prefix: str):
+        """yields every cached value whose key starts with `prefix`, without counting lookups"""
+        if self.disk is not None:
+            # The disk tier holds everything the memory tier does
+            yield from self.disk.values(prefix)
+            return
+        yield from self.memory.values(prefix)
+
+    def stats(self) -> dict:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "hits_stale": self.hits_stale,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "fills_shared": self.fills_shared,
+            "hit_ratio": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "shared": self.shared,
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """returns the process-wide upstream response cache, or None when caching is disabled"""
+    global _response_cache
+
+    if not CACHE_ENABLED:
+        return None
+
+    if _response_cache is None:
+        disk = DiskStore(CACHE_PATH, CACHE_MAX_AGE) if CACHE_PATH else None
+        memory_size = CACHE_SHARED_MEMORY_SIZE if CACHE_SHARED and disk is not None else CACHE_MEMORY_SIZE
+        _response_cache = TieredCache(LRUCache(memory_size, CACHE_MAX_AGE), disk, shared=CACHE_SHARED)
+    return _response_cache
+
+
+def close_response_cache():
+    global _response_cache
+
+    if _response_cache is not None:
+        _response_cache.close()
+        _response_cache = None
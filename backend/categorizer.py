@@ -0,0 +1,64 @@
+import numpy as np
+
+# Same field order as RoleScores in pokemon_categorizer.zig: on a tie the
+# earliest role wins, which is also what np.argmax does.
+ROLE_NAMES = ("Tank", "Attacker", "Speedster", "Support")
+STAT_NAMES = ("hp", "attack", "defense", "special-attack", "special-defense", "speed")
+
+_F32 = np.float32
+
+
+def stats_matrix(stats_list: list) -> np.ndarray:
+    """
+    Packs a batch of stats into an (n, 6) float32 matrix.
+
+    Each entry is either a `{stat_name: base_stat}` dict or a sequence already
+    in STAT_NAMES order (a PokemonRecord's `stats`). Columns follow STAT_NAMES;
+    stats missing from a dict count as 0, exactly like the zero-initialised
+    Stats struct on the Zig side.
+    """
+    if stats_list and not isinstance(stats_list[0], dict):
+        return np.array(stats_list, dtype=_F32).reshape(len(stats_list), len(STAT_NAMES))
+
+    matrix = np.zeros((len(stats_list), len(STAT_NAMES)), dtype=_F32)
+    for row, stats in enumerate(stats_list):
+        for column, stat_name in enumerate(STAT_NAMES):
+            matrix[row, column] = stats.get(stat_name, 0)
+    return matrix
+
+
+def score_roles(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scores every row of a stats matrix for each role in one vectorized pass.
+
+    The weights and the order of operations mirror pokemon_categorizer.zig,
+    in f32, so the scores (and therefore the winning role) match bit for bit.
+
+    Returns:
+        np.ndarray: (n, 4) float32 scores, columns in ROLE_NAMES order
+    """
+    hp, attack, defense, special_attack, special_defense, speed = matrix.astype(_F32, copy=False).T
+
+    scores = np.empty((matrix.shape[0], len(ROLE_NAMES)), dtype=_F32)
+    scores[:, 0] = hp * _F32(0.4) + defense * _F32(0.35) + special_defense * _F32(0.25)
+    scores[:, 1] = attack * _F32(0.6) + special_attack * _F32(0.4)
+    scores[:, 2] = speed * _F32(0.8) + (attack + special_attack) * _F32(0.1)
+    scores[:, 3] = special_defense * _F32(0.4) + hp * _F32(0.3) + defense * _F32(0.3)
+    return scores
+
+
+def categorize_roles(stats_list: list) -> list[str]:
+    """
+    Categorizes a batch of Pokemon into roles.
+
+    Args:
+        stats_list: One `{stat_name: base_stat}` dict or STAT_NAMES-ordered sequence per Pokemon
+
+    Returns:
+        list[str]: The role of each Pokemon, in input order
+    """
+    if not stats_list:
+        return []
+
+    winners = np.argmax(score_roles(stats_matrix(stats_list)), axis=1)
+    return [ROLE_NAMES[index] for index in winners]
@@ -0,0 +1,173 @@
+import asyncio
+import json
+
+from .categorizer import ROLE_NAMES, STAT_NAMES
+from .common import CATEGORIZER_PATH, CATEGORIZER_WORKERS
+
+
+def encode_stat_records(stats_list: list) -> bytes:
+    """Encodes `{stat_name: base_stat}` dicts or STAT_NAMES-ordered sequences as the worker's newline-delimited input."""
+    lines = []
+    for stats in stats_list:
+        items = stats.items() if isinstance(stats, dict) else zip(STAT_NAMES, stats)
+        record = {"stats": [{"base_stat": base_stat, "stat": {"name": stat_name}} for stat_name, base_stat in items]}
+        lines.append(json.dumps(record, separators=(",", ":")))
+    lines.append("")
+    return "\n".join(lines).encode()
+
+
+class ZigCategorizerWorker:
+    """
+    One long-lived `pokemon_categorizer --worker` process driven over pipes.
+
+    A batch that fails or is cancelled part-way leaves the pipes out of step
+    with the next batch, so the process is killed and a fresh one is started
+    for the next batch; so is one that exited on its own.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._process = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        self._process = await asyncio.create_subprocess_exec(
+            self.path,
+            "--worker",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+
+    def _discard(self):
+        """Kills the process without waiting on it; the next batch starts a new one."""
+        process, self._process = self._process, None
+        if process is not None and process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def categorize(self, stats_list: list[dict]) -> list[str]:
+        """
+        Raises:
+            OSError: If the worker can't be started or written to
+            RuntimeError: If the worker exits mid-batch or sends something that isn't a role
+        """
+        async with self._lock:
+            if self._process is None or self._process.returncode is not None:
+                self._discard()
+                await self.start()
+            process = self._process
+
+            async def feed():
+                process.stdin.write(encode_stat_records(stats_list))
+                await process.stdin.drain()
+
+            async def collect():
+                roles = []
+                for _ in stats_list:
+                    line = await process.stdout.readline()
+                    if not line:
+                        raise RuntimeError("Zig categorizer worker exited unexpectedly")
+                    role = line.decode(errors="replace").strip()
+                    if role not in ROLE_NAMES:
+                        raise RuntimeError(f"Zig categorizer worker sent an unknown role {role!r}")
+                    roles.append(role)
+                return roles
+
+            try:
+                # Read while we write so a large batch can't deadlock on full pipes
+                _, roles = await asyncio.gather(feed(), collect())
+            except BaseException:
+                # Unread output would be taken as the next batch's roles
+                self._discard()
+                raise
+            return roles
+
+    async def close(self):
+        if self._process is None:
+            return
+
+        if self._process.returncode is None:
+            self._process.stdin.close()
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout=2)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        self._process = None
+
+
+class ZigCategorizerPool:
+    """
+    Pool of persistent Zig categorizer workers.
+
+    A batch is split across every worker and the slices are categorized in
+    parallel, so there is no fork/exec per Pokemon and large batches stream
+    through the pipes.
+    """
+
+    def __init__(self, path: str = CATEGORIZER_PATH, size: int = CATEGORIZER_WORKERS):
+        self.workers = [ZigCategorizerWorker(path) for _ in range(max(1, size))]
+
+    async def start(self):
+        """
+        Starts every worker and checks that it stays up across records.
+
+        A binary built before `--worker` existed answers one record and
+        exits, which would otherwise cost a respawn on every batch.
+
+        Raises:
+            OSError: If the binary can't be executed (missing, or built for another platform)
+            RuntimeError: If a worker doesn't answer a multi-record batch
+        """
+        await asyncio.gather(*(worker.start() for worker in self.workers))
+        await self.categorize([{}] * (2 * len(self.workers)))
+
+    async def categorize(self, stats_list: list[dict]) -> list[str]:
+        if not stats_list:
+            return []
+
+        chunk_size = -(-len(stats_list) // len(self.workers))
+        chunks = [stats_list[i:i + chunk_size] for i in range(0, len(stats_list), chunk_size)]
+        results = await asyncio.gather(
+            *(worker.categorize(chunk) for worker, chunk in zip(self.workers, chunks))
+        )
+        return [role for chunk_roles in results for role in chunk_roles]
+
+    async def close(self):
+        await asyncio.gather(*(worker.close() for worker in self.workers))
+
+
+_zig_pool = None
+
+
+async def start_zig_pool():
+    """
+    Raises:
+        OSError, RuntimeError: If the workers can't be started (see `ZigCategorizerPool.start`)
+    """
+    global _zig_pool
+
+    if _zig_pool is None:
+        pool = ZigCategorizerPool()
+        try:
+            await pool.start()
+        except BaseException:
+            await pool.close()
+            raise
+        _zig_pool = pool
+    return _zig_pool
+
+
+def get_zig_pool():
+    """returns the running Zig worker pool, or None when the in-process categorizer is used"""
+    return _zig_pool
+
+
+async def stop_zig_pool():
+    global _zig_pool
+
+    if _zig_pool is not None:
+        await _zig_pool.close()
+        _zig_pool = None
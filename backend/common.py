@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import base64
 import os
 
-BASE_URL = "https://pokeapi.co/api/v2/"
+BASE_URL = os.environ.get("POKEFLOW_BASE_URL", "https://pokeapi.co/api/v2/")
 SPRITE_URL = "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites"
 ENDPOINTS = [
     "ability",
@@ -56,6 +57,139 @@ ENDPOINTS = [
 ]
 SPRITE_EXT = "png"
 POKEMON_LIMIT = 20  # Limit for API requests
+POKEMON_MAX_LIMIT = 200  # Largest page a client may ask for
+
+# Upstream HTTP client settings, overridable through the environment
+HTTP2_ENABLED = os.environ.get("POKEFLOW_HTTP2", "1") == "1"
+HTTP_MAX_CONNECTIONS = int(os.environ.get("POKEFLOW_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("POKEFLOW_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("POKEFLOW_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.environ.get("POKEFLOW_HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("POKEFLOW_HTTP_CONNECT_TIMEOUT", "5"))
+
+# Full JSON encodings of this many recently served Pokemon records are kept for reuse
+RECORD_JSON_CACHE_SIZE = int(os.environ.get("POKEFLOW_RECORD_JSON_CACHE_SIZE", "1024"))
+
+# Fan-out settings for hydrating many Pokemon in one request
+FANOUT_CONCURRENCY = int(os.environ.get("POKEFLOW_FANOUT_CONCURRENCY", "10"))
+FANOUT_DEADLINE = float(os.environ.get("POKEFLOW_FANOUT_DEADLINE", "8"))
+
+# Per-request upstream budget: every fetch one request makes shares REQUEST_BUDGET
+# seconds (0 turns it off), after which the request answers with what it has,
+# marked partial. An upstream request slower than the HEDGE_QUANTILE of its
+# endpoint's last HEDGE_WINDOW latencies gets a duplicate, and the first answer wins.
+REQUEST_BUDGET = float(os.environ.get("POKEFLOW_REQUEST_BUDGET", "5"))
+HEDGE_ENABLED = os.environ.get("POKEFLOW_HEDGE", "1") == "1"
+HEDGE_QUANTILE = float(os.environ.get("POKEFLOW_HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.environ.get("POKEFLOW_HEDGE_MIN_DELAY", "0.05"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("POKEFLOW_HEDGE_MIN_SAMPLES", "50"))
+HEDGE_WINDOW = int(os.environ.get("POKEFLOW_HEDGE_WINDOW", "512"))
+
+# Parse projected payloads incrementally as the body streams in (needs ijson):
+# far lower peak memory per fetch, more CPU than the default one-shot parse
+STREAM_PARSE = os.environ.get("POKEFLOW_STREAM_PARSE", "0") == "1"
+
+# Upstream response cache: in-memory LRU in front of an on-disk SQLite store.
+# Entries older than CACHE_FRESH_TTL are stale: still served, but refreshed in
+# the background. Entries older than CACHE_MAX_AGE are dropped from both tiers.
+CACHE_ENABLED = os.environ.get("POKEFLOW_CACHE", "1") == "1"
+CACHE_MEMORY_SIZE = int(os.environ.get("POKEFLOW_CACHE_MEMORY_SIZE", "4096"))
+CACHE_FRESH_TTL = float(os.environ.get("POKEFLOW_CACHE_FRESH_TTL", str(60 * 60)))
+CACHE_MAX_AGE = float(os.environ.get("POKEFLOW_CACHE_MAX_AGE", str(7 * 24 * 60 * 60)))
+CACHE_PATH = os.environ.get(
+    "POKEFLOW_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "responses.sqlite3"),
+)
+
+# DELETE /cache is only served to requests bearing this token
+# (Authorization: Bearer <token>); unset, the route doesn't exist
+CACHE_ADMIN_TOKEN = os.environ.get("POKEFLOW_CACHE_ADMIN_TOKEN", "")
+
+# Several uvicorn workers share the on-disk tier, which runs in WAL mode and is
+# read through mmap (CACHE_MMAP_SIZE bytes), so its pages sit once in the OS page
+# cache for all of them. With CACHE_SHARED on, each worker keeps only a small hot
+# set in memory (CACHE_SHARED_MEMORY_SIZE), picks up other workers' writes and
+# invalidations, and waits up to CACHE_FILL_WAIT seconds for a resource another
+# worker is already fetching instead of fetching it again.
+CACHE_SHARED = os.environ.get("POKEFLOW_CACHE_SHARED", "0") == "1"
+CACHE_SHARED_MEMORY_SIZE = int(os.environ.get("POKEFLOW_CACHE_SHARED_MEMORY_SIZE", "256"))
+CACHE_MMAP_SIZE = int(os.environ.get("POKEFLOW_CACHE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_FILL_WAIT = float(os.environ.get("POKEFLOW_CACHE_FILL_WAIT", "2"))
+
+# Downstream responses: complete bodies of at least GZIP_MIN_SIZE bytes are
+# compressed (brotli if installed, else gzip at GZIP_LEVEL) for clients that accept it
+GZIP_MIN_SIZE = int(os.environ.get("POKEFLOW_GZIP_MIN_SIZE", "500"))
+GZIP_LEVEL = int(os.environ.get("POKEFLOW_GZIP_LEVEL", "6"))
+
+# Sprites: cached on disk under SPRITE_CACHE, laid out like SPRITE_URL (see
+# sprite_filepath_build), and served from /sprites/. With LOCAL_SPRITES on,
+# `sprite` fields in responses point at SPRITE_BASE_URL instead of GitHub;
+# that is the backend's public address, so it has no default and must be set.
+SPRITE_CACHE = os.environ.get(
+    "POKEFLOW_SPRITE_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "sprites"),
+)
+LOCAL_SPRITES = os.environ.get("POKEFLOW_LOCAL_SPRITES", "0") == "1"
+SPRITE_BASE_URL = os.environ.get("POKEFLOW_SPRITE_BASE_URL", "").rstrip("/")
+if LOCAL_SPRITES and not SPRITE_BASE_URL:
+    raise ValueError("POKEFLOW_LOCAL_SPRITES=1 needs POKEFLOW_SPRITE_BASE_URL (e.g. https://pokeflow.example/sprites)")
+SPRITE_MAX_AGE = int(os.environ.get("POKEFLOW_SPRITE_MAX_AGE", str(365 * 24 * 60 * 60)))
+
+# Role categorizer: "numpy" scores in-process, "zig" drives a pool of
+# persistent pokemon_categorizer workers
+CATEGORIZER_BACKEND = os.environ.get("POKEFLOW_CATEGORIZER", "numpy")
+CATEGORIZER_WORKERS = int(os.environ.get("POKEFLOW_CATEGORIZER_WORKERS", "2"))
+CATEGORIZER_PATH = os.environ.get(
+    "POKEFLOW_CATEGORIZER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pokemon_categorizer"),
+)
+
+# Offline snapshot: crawled endpoints, file to serve from, and whether to
+# refuse to fall through to pokeapi.co on a snapshot miss
+SNAPSHOT_ENDPOINTS = ("pokemon", "type", "gender", "ability", "stat")
+SNAPSHOT_PATH = os.environ.get("POKEFLOW_SNAPSHOT")
+SNAPSHOT_OFFLINE = os.environ.get("POKEFLOW_SNAPSHOT_OFFLINE", "0") == "1"
+
+# Background refresh of the most requested cache keys, shortly before they go stale
+REFRESH_INTERVAL = float(os.environ.get("POKEFLOW_REFRESH_INTERVAL", "60"))
+REFRESH_TOP_KEYS = int(os.environ.get("POKEFLOW_REFRESH_TOP_KEYS", "50"))
+REFRESH_AHEAD = float(os.environ.get("POKEFLOW_REFRESH_AHEAD", "300"))
+
+# /role-stats aggregates over the whole Pokedex, recomputed in the background
+# every ROLE_STATS_INTERVAL seconds once Pokemon were added or changed. Without
+# a snapshot, ROLE_STATS_HYDRATE fetches every Pokemon not yet known once at
+# startup, ROLE_STATS_CONCURRENCY at a time, so the aggregates cover the entire
+# Pokedex. With a shared cache, one worker at a time holds the hydration lease
+# (for up to ROLE_STATS_HYDRATE_LEASE seconds): the first fetches from upstream,
+# the rest then read what it fetched back from the cache.
+ROLE_STATS_INTERVAL = float(os.environ.get("POKEFLOW_ROLE_STATS_INTERVAL", "10"))
+ROLE_STATS_HYDRATE = os.environ.get("POKEFLOW_ROLE_STATS_HYDRATE", "1") == "1"
+ROLE_STATS_CONCURRENCY = int(os.environ.get("POKEFLOW_ROLE_STATS_CONCURRENCY", "8"))
+ROLE_STATS_HYDRATE_LEASE = float(os.environ.get("POKEFLOW_ROLE_STATS_HYDRATE_LEASE", "900"))
+
+# Pokemon types served by /pokemon-by-time for each period of the day
+TIME_TYPE_POOLS = {
+    "morning": ["normal", "flying", "fairy"],
+    "day": ["fire", "grass", "ground"],
+    "evening": ["fighting", "poison", "psychic"],
+    "night": ["dark", "ghost", "dragon"]
+}
+
+# /pokemon-by-time keeps this many hydrated Pokemon per type in memory (it
+# samples 20), re-drawn every TIME_POOL_REFRESH_INTERVAL seconds. Each worker
+# has its own pools; with CACHE_SHARED their fetches are shared
+TIME_POOL_SIZE = int(os.environ.get("POKEFLOW_TIME_POOL_SIZE", "30"))
+TIME_POOL_REFRESH_INTERVAL = float(os.environ.get("POKEFLOW_TIME_POOL_REFRESH_INTERVAL", str(15 * 60)))
+
+# Logging: "queue" hands records to a background thread so terminal I/O never
+# blocks the event loop, "console" writes them on the calling thread. DEBUG
+# records (per-fetch chatter) are kept with probability LOG_SAMPLE_RATE.
+# PRETTY_OUTPUT turns the rich tables, panels and rules on or off.
+LOG_MODE = os.environ.get("POKEFLOW_LOG_MODE", "queue")
+LOG_LEVEL = os.environ.get("POKEFLOW_LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.environ.get("POKEFLOW_LOG_SAMPLE_RATE", "1"))
+PRETTY_OUTPUT = os.environ.get("POKEFLOW_PRETTY", "1") == "1"
+
 DEFAULT_ROLES = {
     "Tank": [],
     "Attacker": [],
@@ -97,6 +231,53 @@ def cache_uri_build(endpoint, resource_id=None, subresource=None):
     return "/".join([endpoint, ""])
 
 
+def api_url_from_cache_uri(cache_uri):
+    """returns the PokeAPI url a cache key was built from"""
+
+    return BASE_URL + cache_uri
+
+
+def cache_uri_from_url(url):
+    """
+    returns the cache key for a PokeAPI resource url, or None if it isn't cacheable
+
+    Keys follow the url, so `pokemon/25/` and `pokemon/pikachu/` would be two
+    entries for one Pokemon: Pokemon urls are always built by name (with
+    `api_url_build`), never taken from the id-based urls listings carry.
+    """
+
+    if not url.startswith(BASE_URL) or "?" in url:
+        return None
+
+    parts = [part for part in url[len(BASE_URL):].split("/") if part]
+    if not parts or len(parts) > 3 or parts[0] not in ENDPOINTS:
+        return None
+
+    return cache_uri_build(*parts)
+
+
+def encode_cursor(offset):
+    """returns the opaque pagination cursor for a result offset"""
+
+    return base64.urlsafe_b64encode("o:{}".format(offset).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """returns the result offset a pagination cursor points at (0 for no cursor)"""
+
+    if not cursor:
+        return 0
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, offset = base64.urlsafe_b64decode(padded).decode().split(":")
+        if prefix != "o" or int(offset) < 0:
+            raise ValueError
+        return int(offset)
+    except ValueError:
+        raise ValueError("Bad cursor '{}'".format(cursor))
+
+
 def sprite_url_build(sprite_type, sprite_id, **kwargs):
     options = parse_sprite_options(sprite_type, **kwargs)
 
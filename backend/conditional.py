@@ -0,0 +1,162 @@
+"""
+Downstream HTTP caching and compression.
+
+`ConditionalMiddleware` gives every complete (non-streamed) GET 200 body a
+strong ETag and answers a matching If-None-Match with 304 Not Modified, so a
+client revalidating an unchanged page downloads nothing. Bodies of at least
+GZIP_MIN_SIZE bytes are compressed for clients that accept it: brotli when
+the brotli package is installed, gzip otherwise.
+
+Streamed responses (the NDJSON endpoints) pass through untouched: their
+bodies are only known once fully sent, and buffering them would defeat
+streaming. Starlette's GZipMiddleware is not used because it buffers those
+streams, and its gzip headers carry a timestamp, which would give identical
+bodies different bytes and so different ETags.
+
+Responses that carry their own ETag (cached sprite files) are never buffered
+or recompressed, only answered with 304 when it matches.
+"""
+
+import gzip
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .common import GZIP_LEVEL, GZIP_MIN_SIZE
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body)
+    # mtime=0 keeps the output deterministic, so the ETag is too
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """returns the codings an Accept-Encoding header allows (q > 0)"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str):
+    """returns the coding to compress with for a client, or None to send the body as-is"""
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def entity_tag(body: bytes, encoding: str = None) -> str:
+    """returns the strong ETag of a body, distinct per content coding"""
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    if encoding is not None:
+        digest += "-" + encoding
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+async def send_not_modified(send, start: dict):
+    """Answers 304 in place of a response, keeping its validators and cache headers."""
+    headers = MutableHeaders(scope=start)
+    for name in ("content-length", "content-type", "content-encoding"):
+        if name in headers:
+            del headers[name]
+    await send({**start, "status": 304})
+    await send({"type": "http.response.body", "body": b""})
+
+
+class ConditionalMiddleware:
+    """ASGI middleware adding ETags, 304 Not Modified and compression to complete GET responses."""
+
+    def __init__(self, app, minimum_size: int = GZIP_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        accept_encoding = request_headers.get("accept-encoding", "")
+        start = None
+        passthrough = False
+        not_modified = False
+
+        async def send_conditional(message):
+            nonlocal start, passthrough, not_modified
+
+            if message["type"] == "http.response.start":
+                # Held back until we know whether the body arrives in one piece
+                start = message
+                return
+            if not_modified:
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(scope=start)
+            if start["status"] == 200 and "etag" in headers:
+                # The app set its own validator (e.g. a file): honour it without buffering the body
+                passthrough = True
+                if if_none_match is not None and etag_matches(if_none_match, headers["etag"]):
+                    not_modified = True
+                    await send_not_modified(send, start)
+                    return
+                await send(start)
+                await send(message)
+                return
+            if (
+                message["type"] != "http.response.body"
+                or start["status"] != 200
+                or message.get("more_body", False)
+                or "content-encoding" in headers
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            encoding = choose_encoding(accept_encoding) if len(body) >= self.minimum_size else None
+            etag = entity_tag(body, encoding)
+            headers["ETag"] = etag
+            headers.add_vary_header("Accept-Encoding")
+
+            if if_none_match is not None and etag_matches(if_none_match, etag):
+                await send_not_modified(send, start)
+                return
+
+            if encoding is not None:
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_conditional)
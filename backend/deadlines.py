@@ -0,0 +1,228 @@
+"""
+Upstream tail latency: per-request deadline budgets and hedged requests.
+
+A request's latency is set by the slowest of its upstream fetches. Two
+things keep one slow PokeAPI response from setting it:
+
+- Every request gets a `Budget` (REQUEST_BUDGET seconds), carried in a
+  context variable so every fetch and fan-out it makes sees it, including
+  those in tasks it spawns. A fetch still waiting when the budget runs out is
+  abandoned (the shared upstream request keeps going and still fills the
+  cache), and the request answers with whatever it has, marked partial.
+- An upstream request still unanswered after the HEDGE_QUANTILE of its
+  endpoint's recent latencies gets a duplicate; whichever answers first wins
+  and the other is cancelled. With the default p95, about one request in
+  twenty is sent twice.
+"""
+
+import asyncio
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+import httpx
+from starlette.datastructures import MutableHeaders
+
+from .common import (
+    HEDGE_ENABLED,
+    HEDGE_MIN_DELAY,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_QUANTILE,
+    HEDGE_WINDOW,
+    REQUEST_BUDGET,
+)
+from .metrics import PARTIAL_RESPONSES, UPSTREAM_HEDGES
+
+
+class BudgetExhausted(httpx.TimeoutException):
+    """Raised by a fetch that ran out of request budget; callers handle it like any upstream timeout."""
+
+
+class Budget:
+    """The deadline of one request, and whether anything was dropped to meet it."""
+
+    __slots__ = ("deadline", "partial")
+
+    def __init__(self, seconds: float):
+        self.deadline = asyncio.get_running_loop().time() + seconds
+        self.partial = False
+
+    def remaining(self) -> float:
+        return self.deadline - asyncio.get_running_loop().time()
+
+
+# Tasks copy the context they are created in, so they share their request's Budget object
+_budget: ContextVar = ContextVar("pokeflow_budget", default=None)
+
+
+def remaining_budget():
+    """returns the seconds left in the current request's budget, or None outside a budgeted request"""
+    budget = _budget.get()
+    return budget.remaining() if budget is not None else None
+
+
+def mark_partial():
+    """Records that the current request is answering with less than it was asked for."""
+    budget = _budget.get()
+    if budget is not None:
+        budget.partial = True
+
+
+def is_partial() -> bool:
+    budget = _budget.get()
+    return budget is not None and budget.partial
+
+
+async def within_budget(awaitable):
+    """
+    Awaits `awaitable` for at most the rest of the request's budget.
+
+    Raises:
+        BudgetExhausted: If the budget runs out first
+    """
+    remaining = remaining_budget()
+    if remaining is None:
+        return await awaitable
+    if remaining <= 0:
+        # Not awaited, so close it rather than leave a never-awaited coroutine behind
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise BudgetExhausted("Request budget exhausted")
+    try:
+        return await asyncio.wait_for(awaitable, remaining)
+    except asyncio.TimeoutError:
+        raise BudgetExhausted("Request budget exhausted") from None
+
+
+async def without_budget(coroutine):
+    """Runs a coroutine free of the request budget, e.g. a background task outliving its request."""
+    # A task runs in its own copy of the context, so this doesn't touch the request's
+    _budget.set(None)
+    return await coroutine
+
+
+class LatencyWindow:
+    """Recent upstream latencies per endpoint family, for picking when to hedge."""
+
+    def __init__(self, size: int = HEDGE_WINDOW, quantile: float = HEDGE_QUANTILE):
+        self.quantile = quantile
+        self._samples = defaultdict(lambda: deque(maxlen=size))
+        self._observed = defaultdict(int)
+        self._cutoffs = {}
+        # Re-sort at most once per this many new samples
+        self._recompute_every = max(1, size // 32)
+
+    def observe(self, endpoint: str, seconds: float):
+        self._samples[endpoint].append(seconds)
+        self._observed[endpoint] += 1
+        if self._observed[endpoint] % self._recompute_every == 0:
+            self._cutoffs.pop(endpoint, None)
+
+    def cutoff(self, endpoint: str):
+        """returns the endpoint's latency quantile, or None until it has HEDGE_MIN_SAMPLES samples"""
+        samples = self._samples.get(endpoint)
+        if samples is None or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        cutoff = self._cutoffs.get(endpoint)
+        if cutoff is None:
+            ordered = sorted(samples)
+            cutoff = self._cutoffs[endpoint] = ordered[int(self.quantile * (len(ordered) - 1))]
+        return cutoff
+
+    def hedge_delay(self, endpoint: str):
+        """returns how long to wait before hedging a request to `endpoint`, or None to not hedge"""
+        cutoff = self.cutoff(endpoint)
+        return max(cutoff, HEDGE_MIN_DELAY) if cutoff is not None else None
+
+
+upstream_latencies = LatencyWindow()
+
+
+async def timed_attempt(endpoint: str, attempt):
+    started = time.perf_counter()
+    try:
+        result = await attempt()
+    except asyncio.CancelledError:
+        # A lower bound, but it keeps slow spells visible even when hedges win them
+        upstream_latencies.observe(endpoint, time.perf_counter() - started)
+        raise
+    upstream_latencies.observe(endpoint, time.perf_counter() - started)
+    return result
+
+
+async def hedged(endpoint: str, attempt):
+    """
+    Runs `attempt`, sending a second one if the first is slower than usual for `endpoint`.
+
+    Args:
+        endpoint: Upstream endpoint family whose latencies decide the hedge delay
+        attempt: Async callable making the (idempotent) upstream request
+
+    Returns:
+        The result of whichever attempt succeeds first
+
+    Raises:
+        Whatever the first attempt raised, if no attempt succeeds
+    """
+    delay = upstream_latencies.hedge_delay(endpoint) if HEDGE_ENABLED else None
+    first = asyncio.ensure_future(timed_attempt(endpoint, attempt))
+    if delay is None:
+        return await first
+
+    attempts = [first]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if not done:
+            UPSTREAM_HEDGES.inc(endpoint=endpoint, outcome="sent")
+            attempts.append(asyncio.ensure_future(timed_attempt(endpoint, attempt)))
+
+        pending = set(attempts)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in attempts:
+                if task in done and task.exception() is None:
+                    if task is not first:
+                        UPSTREAM_HEDGES.inc(endpoint=endpoint, outcome="won")
+                    return task.result()
+        return first.result()
+    finally:
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware giving every request a `Budget`.
+
+    A response whose request dropped anything to meet its budget is sent with
+    `X-Partial: true` and `Cache-Control: no-store`, so nothing keeps it in
+    place of the complete answer. Streamed responses have sent their headers
+    before they know, so they are only cut short, not marked.
+    """
+
+    def __init__(self, app, budget: float = REQUEST_BUDGET):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.budget <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        budget = Budget(self.budget)
+
+        async def send_marked(message):
+            if message["type"] == "http.response.start" and budget.partial:
+                headers = MutableHeaders(scope=message)
+                headers["X-Partial"] = "true"
+                headers["Cache-Control"] = "no-store"
+                route = scope.get("route")
+                PARTIAL_RESPONSES.inc(route=route.path if route is not None else "unmatched")
+            await send(message)
+
+        token = _budget.set(budget)
+        try:
+            await self.app(scope, receive, send_marked)
+        finally:
+            _budget.reset(token)
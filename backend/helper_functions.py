@@ -2,231 +2,571 @@ import httpx
 import logging
 import asyncio
 import random
-from rich.console import Console
 from rich import print as rprint
-import json
-import subprocess
 
-console = Console()
+from .cache import get_response_cache
+from .categorizer import categorize_roles
+from .categorizer_pool import get_zig_pool
+from .deadlines import hedged, mark_partial, remaining_budget, within_budget, without_budget
+from .metrics import (
+    CATEGORIZER_DURATION,
+    CATEGORIZER_POKEMON,
+    FANOUT_DURATION,
+    FANOUT_ITEMS,
+    POKEMON_FETCH_DURATION,
+    InstrumentedTransport,
+    upstream_endpoint,
+)
+from .projection import projects, read_projected
+from .records import PokemonRecord
+from .similarity import get_stat_index
+from .singleflight import SingleFlight
+from .snapshot import snapshot_lookup
+from .categorizer import STAT_NAMES
+from .common import (
+    api_url_build,
+    cache_uri_from_url,
+    CACHE_FILL_WAIT,
+    FANOUT_CONCURRENCY,
+    FANOUT_DEADLINE,
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_TIMEOUT,
+)
+
 logger = logging.getLogger(__name__)
 
-async def fetch_pokemon_data(pokemon_url: str) -> dict:
-    try:
-        async with httpx.AsyncClient() as client:
-            console.print(f"[dim]Fetching data for: {pokemon_url}[/dim]")
-            response = await client.get(pokemon_url)
+# Identical upstream fetches in flight at the same time share one request
+upstream_flight = SingleFlight()
+
+# Keeps fire-and-forget tasks (e.g. next-page prefetches) alive until they finish
+background_tasks = set()
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Creates the app-lifetime upstream client shared by every PokeAPI call.
+
+    Connections are kept alive and pooled (and multiplexed over HTTP/2 when
+    enabled), so a request fanning out to 20 Pokemon reuses warm connections
+    instead of paying a TLS handshake per fetch. Every request goes through
+    `InstrumentedTransport`, which records upstream latency and status.
+
+    Returns:
+        httpx.AsyncClient: The pooled client, to be closed on shutdown
+    """
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    transport = InstrumentedTransport(httpx.AsyncHTTPTransport(http2=HTTP2_ENABLED, limits=limits))
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
+
+@projects("id", "name", "types", "abilities", "stats", "sprites")
+def project_pokemon_payload(data: dict) -> dict:
+    """
+    Reduces a /pokemon payload to the compact form the response cache holds.
+
+    Types and abilities become lists of names, stats a list of base stats in
+    STAT_NAMES order and the sprite a single URL: about a tenth of the
+    memory of the nested upstream shape, and exactly what
+    `PokemonRecord.from_payload` reads. The declared fields let
+    `fetch_upstream` skip the rest while parsing.
+    """
+    base_stats = {s["stat"]["name"]: s["base_stat"] for s in data["stats"]}
+    return {
+        "id": data.get("id"),
+        "name": data["name"],
+        "types": [t["type"]["name"] for t in data["types"]],
+        "abilities": [a["ability"]["name"] for a in data["abilities"]],
+        "stats": [base_stats.get(stat_name, 0) for stat_name in STAT_NAMES],
+        "sprite": data["sprites"]["front_default"],
+    }
+
+@projects("id", "name", "species", "types", "abilities", "stats", "sprites")
+def trim_pokemon_payload(data: dict) -> dict:
+    """
+    Trims a /pokemon payload to the fields we read, keeping the upstream shape.
+
+    Snapshots store Pokemon this way because the bench stand-in serves them
+    back as PokeAPI responses; urls, slots, efforts and `is_hidden` are dropped.
+    """
+    return {
+        "id": data.get("id"),
+        "name": data["name"],
+        "species": {"name": data.get("species", {}).get("name", data["name"])},
+        "types": [{"type": {"name": t["type"]["name"]}} for t in data["types"]],
+        "abilities": [{"ability": {"name": a["ability"]["name"]}} for a in data["abilities"]],
+        "stats": [{"base_stat": s["base_stat"], "stat": {"name": s["stat"]["name"]}} for s in data["stats"]],
+        "sprites": {"front_default": data["sprites"]["front_default"]},
+    }
+
+async def fetch_json(client: httpx.AsyncClient, url: str, project=None):
+    """
+    Fetches a PokeAPI resource, serving it from the offline snapshot or the
+    response cache when possible.
+
+    Cache misses for the same resource that arrive while a fetch is already
+    in flight wait on that fetch rather than sending their own request. A
+    stale cache entry is returned immediately and refreshed in the background.
+
+    Args:
+        client: Shared upstream HTTP client
+        url: PokeAPI resource URL
+        project: Optional callable applied to the payload before it is cached
+
+    Returns:
+        The (projected) JSON payload
+
+    Raises:
+        httpx.HTTPError: If the upstream request fails
+    """
+    key = cache_uri_from_url(url)
+    data = snapshot_lookup(key)
+    if data is not None:
+        return data
+
+    cache = get_response_cache()
+    if cache is not None and key is not None:
+        entry = cache.get_entry(key)
+        if entry is not None:
+            data, stored_at = entry[:2]
+            if cache.is_stale(stored_at):
+                # Stale-while-revalidate: answer now, refresh off the request path
+                refresh_in_background(client, url, project, stored_at)
+            return data
+
+    return await fetch_upstream(client, url, project, seen=0.0)
+
+async def fetch_upstream(client: httpx.AsyncClient, url: str, project=None, seen: float = None):
+    """
+    Fetches a PokeAPI resource from upstream and stores it in the response cache.
+
+    Concurrent fetches of the same resource share one request, hedged with a
+    duplicate if it is slower than usual (see `deadlines.hedged`). When
+    `project` declares its fields (see `projection.projects`), only those
+    are parsed out of the response body. If the resource is already cached
+    with an ETag or Last-Modified, the request is conditional and a 304 Not
+    Modified just marks the cached value fresh again, without a body to download.
+
+    Within a request, waits at most for the rest of its budget; the shared
+    request itself keeps going, so the cache still gets the answer. With a
+    cache shared between workers, a resource another worker is already
+    fetching is waited for (up to CACHE_FILL_WAIT) rather than fetched again,
+    and one another worker stored since the caller looked isn't fetched at all.
+
+    Args:
+        client: Shared upstream HTTP client
+        url: PokeAPI resource URL
+        project: Optional callable applied to the payload before it is cached
+        seen: When the cached copy the caller decided to replace was stored
+            (0.0 if there was none), or None to look it up
+
+    Raises:
+        httpx.HTTPError: If the upstream request fails
+        BudgetExhausted: If the request's budget runs out first
+    """
+    key = cache_uri_from_url(url)
+    cache = get_response_cache()
+
+    async def fetch():
+        cached = cache.peek_entry(key) if cache is not None and key is not None else None
+        validators = cached[2] if cached is not None else None
+        headers = conditional_headers(validators)
+
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                await cache.arevalidate(key, cached[0], response_validators(response) or validators)
+                return cached[0]
             response.raise_for_status()
-            data = response.json()
-            
-            transformed_data = {
-                "name": data["name"],
-                "types": [t["type"]["name"] for t in data["types"]],
-                "abilities": [a["ability"]["name"] for a in data["abilities"]],
-                "stats": {s["stat"]["name"]: s["base_stat"] for s in data["stats"]},
-                "sprite": data["sprites"]["front_default"],     
-            }
-            
-            console.print(f"[green]✓[/green] Successfully fetched data for: [bold]{data['name']}[/bold]")
-            return transformed_data
+            data = await read_projected(response, getattr(project, "fields", None))
+        if project is not None:
+            data = project(data)
+
+        if cache is not None and key is not None:
+            await cache.aset(key, data, response_validators(response))
+        return data
+
+    endpoint = upstream_endpoint(url)
+
+    async def fill():
+        if cache is None or key is None:
+            return await hedged(endpoint, fetch)
+        if seen is not None:
+            stored_after = seen
+        else:
+            stored_at = cache.peek_stored_at(key)
+            stored_after = stored_at if stored_at is not None else 0.0
+        if not await cache.claim_fill(key):
+            data = await wait_for_fill(cache, key, stored_after)
+            if data is not None:
+                return data
+        try:
+            if cache.shared:
+                # Another worker may have filled it between our lookup and the claim
+                entry = cache.newer_entry(key, stored_after)
+                if entry is not None:
+                    cache.fills_shared += 1
+                    return entry[0]
+            return await hedged(endpoint, fetch)
+        finally:
+            await cache.release_fill(key)
+
+    return await within_budget(upstream_flight.do(key or url, fill))
+
+async def wait_for_fill(cache, key: str, stored_after: float, poll: float = 0.02):
+    """
+    Waits for another worker's fetch of `key` to land in the shared cache.
+
+    Args:
+        cache: The shared response cache
+        key: Cache key being filled
+        stored_after: Only an entry stored after this counts as the fill
+
+    Returns:
+        The fetched value, or None if the other worker gave up or it didn't
+        arrive within CACHE_FILL_WAIT
+    """
+    loop = asyncio.get_running_loop()
+    give_up = loop.time() + CACHE_FILL_WAIT
+    while loop.time() < give_up:
+        await asyncio.sleep(poll)
+        # Checked before the entry: the owner stores before releasing, so none is missed in between
+        still_filling = cache.filling(key)
+        entry = cache.newer_entry(key, stored_after)
+        if entry is not None:
+            cache.fills_shared += 1
+            return entry[0]
+        if not still_filling:
+            # It finished without storing anything (e.g. a 404): fetch it ourselves
+            return None
+    return None
+
+def conditional_headers(validators: dict) -> dict:
+    """returns the If-None-Match / If-Modified-Since headers for cached validators"""
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+def response_validators(response: httpx.Response):
+    """returns the ETag / Last-Modified an upstream response was served with, or None"""
+    etag = response.headers.get("etag")
+    last_modified = response.headers.get("last-modified")
+    if etag is None and last_modified is None:
+        return None
+    return {"etag": etag, "last_modified": last_modified}
+
+def refresh_in_background(client: httpx.AsyncClient, url: str, project=None, seen: float = None):
+    """Re-fetches a resource into the cache without making anyone wait for it."""
+    async def refresh():
+        try:
+            await fetch_upstream(client, url, project, seen)
+        except httpx.HTTPError as e:
+            logger.warning("Background refresh of %s failed: %s", url, e)
+
+    run_in_background(refresh())
+
+def run_in_background(coroutine):
+    """Starts a fire-and-forget task, keeping a reference until it finishes; it isn't bound by the request budget."""
+    task = asyncio.ensure_future(without_budget(coroutine))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# Pokemon name -> (payload, the record built from it)
+pokemon_records = {}
+
+async def fetch_pokemon_data(client: httpx.AsyncClient, pokemon_url: str):
+    """
+    Fetches one Pokemon and builds its record, adding it to the stat similarity index.
+
+    A memory-tier or snapshot hit hands back the same payload object as
+    last time, so its record is reused as is; a record is only built (and
+    the index only updated) when the payload is new or was refreshed.
+
+    Returns:
+        PokemonRecord: The Pokemon, or None if the fetch failed
+    """
+    try:
+        logger.debug("Fetching data for: %s", pokemon_url)
+        with POKEMON_FETCH_DURATION.time():
+            data = await fetch_json(client, pokemon_url, project=project_pokemon_payload)
+            known = pokemon_records.get(data["name"])
+            if known is not None and known[0] is data:
+                return known[1]
+            record = PokemonRecord.from_payload(data)
+        pokemon_records[record.name] = (data, record)
+        get_stat_index().add(record)
+        
+        logger.debug("Successfully fetched data for: %s", record.name)
+        return record
     except httpx.HTTPError as e:
-        console.print(f"[bold red]Error:[/bold red] Failed to fetch Pokemon data: {str(e)}")
-        return {}
+        if isinstance(e, httpx.TimeoutException):
+            # Missing for slowness, not because it doesn't exist
+            mark_partial()
+        logger.error("Failed to fetch Pokemon data: %s", e)
+        return None
+
+async def fan_out(items: list, worker, concurrency: int = FANOUT_CONCURRENCY, deadline: float = FANOUT_DEADLINE) -> list:
+    """
+    Runs an async worker over many items concurrently with bounded parallelism.
+
+    At most `concurrency` workers are in flight at once so a large fan-out
+    doesn't flood the upstream. Whatever hasn't finished when the deadline
+    (or the request's budget, if sooner) passes is cancelled and dropped,
+    and the request is marked partial.
+
+    Args:
+        items: Inputs to hand to the worker, one call each
+        worker: Async callable taking a single item
+        concurrency: Maximum number of workers running at the same time
+        deadline: Seconds to wait for the whole fan-out before giving up, None for no limit
+
+    Returns:
+        list: Non-empty worker results, in the same order as `items`
+    """
+    if not items:
+        return []
+
+    budget = remaining_budget()
+    if budget is not None:
+        deadline = max(0.0, budget if deadline is None else min(deadline, budget))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        async with semaphore:
+            return await worker(item)
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    with FANOUT_DURATION.time():
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        mark_partial()
+        FANOUT_ITEMS.inc(len(pending), outcome="timeout")
+        logger.warning("Fan-out deadline hit, dropped %d of %d fetches", len(pending), len(tasks))
+
+    results = []
+    for task in tasks:
+        if task not in done:
+            continue
+        if task.exception() is not None:
+            FANOUT_ITEMS.inc(outcome="error")
+            continue
+        result = task.result()
+        if result:
+            results.append(result)
+        else:
+            FANOUT_ITEMS.inc(outcome="empty")
+    FANOUT_ITEMS.inc(len(results), outcome="ok")
+    return results
+
+async def fetch_pokemon_many(client: httpx.AsyncClient, pokemon_urls: list[str]) -> list[PokemonRecord]:
+    """
+    Fetches many Pokemon through the shared fan-out engine.
+
+    Args:
+        client: Shared upstream HTTP client
+        pokemon_urls: Pokemon API URLs to fetch
+
+    Returns:
+        list[PokemonRecord]: The Pokemon, in the same order as `pokemon_urls`
+    """
+    return await fan_out(pokemon_urls, lambda url: fetch_pokemon_data(client, url))
+
+async def iter_pokemon_as_completed(client: httpx.AsyncClient, pokemon_urls: list[str], concurrency: int = FANOUT_CONCURRENCY):
+    """
+    Yields Pokemon records in completion order, as soon as each fetch lands.
+
+    Only `concurrency` fetches exist at any time (new ones are started as old
+    ones finish), so memory stays flat however long the listing is. The
+    stream ends early when the request's budget runs out.
+
+    Args:
+        client: Shared upstream HTTP client
+        pokemon_urls: Pokemon API URLs to fetch
+        concurrency: Maximum number of fetches in flight
+    """
+    urls = iter(pokemon_urls)
+    pending = set()
+    try:
+        while True:
+            while len(pending) < concurrency:
+                url = next(urls, None)
+                if url is None:
+                    break
+                pending.add(asyncio.ensure_future(fetch_pokemon_data(client, url)))
+
+            if not pending:
+                return
+
+            budget = remaining_budget()
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0.0, budget) if budget is not None else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                mark_partial()
+                logger.warning("Request budget hit, ended stream with %d fetches pending", len(pending))
+                return
+            for task in done:
+                if task.exception() is None and task.result():
+                    yield task.result()
+    finally:
+        # The client went away mid-stream: don't leave fetches running
+        for task in pending:
+            task.cancel()
+
+async def fetch_pokemon_page(client: httpx.AsyncClient, pokemon_urls: list[str], offset: int, limit: int) -> list[PokemonRecord]:
+    """
+    Hydrates one page of a Pokemon listing and prefetches the next one.
+
+    The next page is fetched in the background into the response cache, so
+    paging through a long listing costs roughly one cache read per page.
+
+    Args:
+        client: Shared upstream HTTP client
+        pokemon_urls: The whole listing's Pokemon API URLs
+        offset: Index of the first Pokemon on the page
+        limit: Page size
+
+    Returns:
+        list[PokemonRecord]: The Pokemon on the page
+    """
+    pokemon_list = await fetch_pokemon_many(client, pokemon_urls[offset:offset + limit])
+
+    next_urls = pokemon_urls[offset + limit:offset + 2 * limit]
+    if next_urls and get_response_cache() is not None:
+        run_in_background(fetch_pokemon_many(client, next_urls))
+
+    return pokemon_list
 
 def categorize_pokemon_role(stats: dict) -> str:
     """
-    Categorizes a Pokemon into a role using the Zig executable.
+    Categorizes a Pokemon into a role using the in-process categorizer.
     
     Args:
-        stats (dict): Raw Pokemon stats from the API
+        stats (dict): Pokemon stats as `{stat_name: base_stat}`
     
     Returns:
         str: The determined role ('Tank', 'Attacker', 'Speedster', or 'Support')
     """
-    try:
-        # Transform the stats into the format expected by the Zig program
-        formatted_stats = []
-        for stat_name, base_stat in stats.items():
-            formatted_stats.append({
-                "base_stat": base_stat,
-                "effort": 0,
-                "stat": {
-                    "name": stat_name,
-                    "url": f"https://pokeapi.co/api/v2/stat/{stat_name}"
-                }
-            })
-        
-        stats_json = json.dumps({"stats": formatted_stats})
-        
-        result = subprocess.run(
-            ["./pokemon_categorizer"],
-            input=stats_json.encode(),
-            capture_output=True,
-            check=True
-        )
-        role = result.stdout.decode().strip()
-        
-        console.print(f"[dim]Role determined by Zig: [bold]{role}[/bold][/dim]")
-        return role
-        
-    except subprocess.CalledProcessError as e:
-        console.print(f"[bold red]Error:[/bold red] Zig categorizer failed: {str(e)}")
-        return "Support"
+    with CATEGORIZER_DURATION.time(backend="numpy"):
+        role = categorize_roles([stats])[0]
+    CATEGORIZER_POKEMON.inc(backend="numpy")
+    return role
+
+async def categorize_pokemon_roles(stats_list: list) -> list[str]:
+    """
+    Categorizes a whole batch of Pokemon in one pass.
+
+    Uses the persistent Zig worker pool when it is running, otherwise the
+    vectorized in-process categorizer; both apply the same role weights.
+
+    Args:
+        stats_list: One `{stat_name: base_stat}` dict or PokemonRecord `stats` array per Pokemon
 
-async def fetch_pokemon_batch(urls: list[str], time_period: str = None) -> list[dict]:
+    Returns:
+        list[str]: The role of each Pokemon, in input order
     """
-    Efficiently fetches multiple Pokemon data in parallel using asyncio.gather
+    pool = get_zig_pool()
+    if pool is not None:
+        try:
+            with CATEGORIZER_DURATION.time(backend="zig"):
+                roles = await pool.categorize(stats_list)
+            CATEGORIZER_POKEMON.inc(len(roles), backend="zig")
+            logger.debug("Categorized %d Pokemon with Zig workers", len(roles))
+            return roles
+        except (OSError, RuntimeError) as e:
+            logger.error("Zig categorizer failed, falling back: %s", e)
+
+    with CATEGORIZER_DURATION.time(backend="numpy"):
+        roles = categorize_roles(stats_list)
+    CATEGORIZER_POKEMON.inc(len(roles), backend="numpy")
+    logger.debug("Categorized %d Pokemon in-process", len(roles))
+    return roles
+
+async def fetch_pokemon_batch(client: httpx.AsyncClient, urls: list[str], time_period: str = None) -> list[dict]:
+    """
+    Efficiently fetches multiple Pokemon data in parallel through the fan-out engine
     
     Args:
+        client: Shared upstream HTTP client
         urls: List of Pokemon API URLs to fetch
         time_period: Optional time period to add to each Pokemon's data
         
     Returns:
         List of transformed Pokemon data dictionaries
     """
-    async with httpx.AsyncClient() as client:
-        # Create tasks for all URLs
-        tasks = []
-        for url in urls:
-            tasks.append(
-                client.get(url)
-            )
-        
-        # Execute all requests concurrently
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Process results
-        pokemon_list = []
-        for response in responses:
-            if isinstance(response, Exception) or response.status_code != 200:
-                continue
-                
-            try:
-                data = response.json()
-                pokemon_data = {
-                    "name": data["name"],
-                    "types": [t["type"]["name"] for t in data["types"]],
-                    "abilities": [a["ability"]["name"] for a in data["abilities"]],
-                    "stats": {s["stat"]["name"]: s["base_stat"] for s in data["stats"]},
-                    "sprite": data["sprites"]["front_default"]
-                }
-                
-                if time_period:
-                    pokemon_data["time_period"] = time_period
-                    
-                pokemon_list.append(pokemon_data)
-                console.print(f"[green]✓[/green] Fetched: [bold]{data['name']}[/bold]")
-            except Exception as e:
-                console.print(f"[red]✗[/red] Failed to process Pokemon data: {str(e)}")
-                
-        return pokemon_list
-
-async def fetch_all_pokemon_of_type(type_name: str, limit: int = 20) -> list[dict]:
+    pokemon_list = await fetch_pokemon_many(client, urls)
+    extra = {"time_period": time_period} if time_period else {}
+    return [pokemon.to_dict(**extra) for pokemon in pokemon_list]
+
+async def fetch_all_pokemon_of_type(client: httpx.AsyncClient, type_name: str, limit: int = 20) -> list[PokemonRecord]:
     """
     Efficiently fetches all Pokemon of a specific type in a single request.
     
     Args:
+        client: Shared upstream HTTP client
         type_name: The type of Pokemon to fetch
         limit: Maximum number of Pokemon to return
         
     Returns:
-        List of Pokemon data dictionaries
+        List of Pokemon records
     """
     try:
         # First get the type data which includes all Pokemon of that type
-        type_url = f"https://pokeapi.co/api/v2/type/{type_name}"
+        type_url = api_url_build("type", type_name)
         
-        async with httpx.AsyncClient() as client:
-            console.print(f"[dim]Fetching Pokemon of type: {type_name}[/dim]")
-            
-            # Get all Pokemon of this type
-            type_response = await client.get(type_url)
-            type_response.raise_for_status()
-            type_data = type_response.json()
-            
-            # Randomly select Pokemon entries up to the limit
-            pokemon_entries = type_data.get("pokemon", [])
-            selected_entries = random.sample(pokemon_entries, min(limit, len(pokemon_entries)))
-            
-            # Create URLs for batch request
-            pokemon_urls = [entry["pokemon"]["url"] for entry in selected_entries]
-            
-            # Fetch all Pokemon data in parallel
-            tasks = [client.get(url) for url in pokemon_urls]
-            responses = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Process results
-            pokemon_list = []
-            for response in responses:
-                if isinstance(response, Exception) or response.status_code != 200:
-                    continue
-                    
-                try:
-                    data = response.json()
-                    pokemon_data = {
-                        "name": data["name"],
-                        "types": [t["type"]["name"] for t in data["types"]],
-                        "abilities": [a["ability"]["name"] for a in data["abilities"]],
-                        "stats": {s["stat"]["name"]: s["base_stat"] for s in data["stats"]},
-                        "sprite": data["sprites"]["front_default"]
-                    }
-                    pokemon_list.append(pokemon_data)
-                    console.print(f"[green]✓[/green] Processed: [bold]{data['name']}[/bold]")
-                except Exception as e:
-                    console.print(f"[red]✗[/red] Failed to process Pokemon data: {str(e)}")
-            
-            return pokemon_list
+        logger.debug("Fetching Pokemon of type: %s", type_name)
+        
+        # Get all Pokemon of this type
+        type_data = await fetch_json(client, type_url)
+        
+        # Randomly select Pokemon entries up to the limit
+        pokemon_entries = type_data.get("pokemon", [])
+        selected_entries = random.sample(pokemon_entries, min(limit, len(pokemon_entries)))
+        
+        # Create URLs for batch request
+        pokemon_urls = [api_url_build("pokemon", entry["pokemon"]["name"]) for entry in selected_entries]
+        
+        # Fetch all Pokemon data in parallel
+        return await fetch_pokemon_many(client, pokemon_urls)
             
     except httpx.HTTPError as e:
-        console.print(f"[bold red]Error:[/bold red] Failed to fetch Pokemon data: {str(e)}")
+        logger.error("Failed to fetch Pokemon data: %s", e)
         return []
 
-async def fetch_pokemon_list(offset: int = 0, limit: int = 20) -> list[dict]:
+async def fetch_pokemon_list(client: httpx.AsyncClient, offset: int = 0, limit: int = 20) -> list[PokemonRecord]:
     """
     Fetches a list of Pokemon in a single request using offset and limit.
     
     Args:
+        client: Shared upstream HTTP client
         offset: Starting index
         limit: Maximum number of Pokemon to return
         
     Returns:
-        List of Pokemon data dictionaries
+        List of Pokemon records
     """
     try:
-        base_url = "https://pokeapi.co/api/v2/pokemon"
-        async with httpx.AsyncClient() as client:
-            # Get Pokemon list with limit and offset
-            list_url = f"{base_url}?offset={offset}&limit={limit}"
-            response = await client.get(list_url)
-            response.raise_for_status()
-            
-            pokemon_list = response.json()["results"]
-            
-            # Fetch all Pokemon data in parallel
-            tasks = [client.get(pokemon["url"]) for pokemon in pokemon_list]
-            responses = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Process results
-            processed_pokemon = []
-            for response in responses:
-                if isinstance(response, Exception) or response.status_code != 200:
-                    continue
-                    
-                try:
-                    data = response.json()
-                    pokemon_data = {
-                        "name": data["name"],
-                        "types": [t["type"]["name"] for t in data["types"]],
-                        "abilities": [a["ability"]["name"] for a in data["abilities"]],
-                        "stats": {s["stat"]["name"]: s["base_stat"] for s in data["stats"]},
-                        "sprite": data["sprites"]["front_default"]
-                    }
-                    processed_pokemon.append(pokemon_data)
-                    console.print(f"[green]✓[/green] Processed: [bold]{data['name']}[/bold]")
-                except Exception as e:
-                    console.print(f"[red]✗[/red] Failed to process Pokemon data: {str(e)}")
-            
-            return processed_pokemon
-            
+        base_url = api_url_build("pokemon")
+        # Get Pokemon list with limit and offset
+        list_url = f"{base_url}?offset={offset}&limit={limit}"
+        pokemon_list = (await fetch_json(client, list_url))["results"]
+        
+        # Fetch all Pokemon data in parallel
+        return await fetch_pokemon_many(client, [api_url_build("pokemon", pokemon["name"]) for pokemon in pokemon_list])
+        
     except httpx.HTTPError as e:
-        console.print(f"[bold red]Error:[/bold red] Failed to fetch Pokemon list: {str(e)}")
+        logger.error("Failed to fetch Pokemon list: %s", e)
         return []
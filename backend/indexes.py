@@ -0,0 +1,111 @@
+import logging
+from collections import defaultdict
+
+from .categorizer import categorize_roles
+from .records import PokemonRecord
+from .snapshot import get_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class PokedexIndex:
+    """
+    Inverted indexes over the whole Pokedex.
+
+    Every index maps a key (type, ability, gender, role) to the set of Pokemon
+    ids carrying it, so filters are set intersections instead of fetching and
+    scanning Pokemon one by one. Ability lookups are case-insensitive.
+    """
+
+    def __init__(self):
+        self.pokemon = {}
+        self.ids_by_name = {}
+        self.by_type = defaultdict(set)
+        self.by_ability = defaultdict(set)
+        self.by_gender = defaultdict(set)
+        self.by_role = defaultdict(set)
+        self.ability_names = {}
+
+    def add_pokemon(self, pokemon_id: int, pokemon: PokemonRecord, role: str):
+        self.pokemon[pokemon_id] = pokemon
+        self.ids_by_name[pokemon.name] = pokemon_id
+        for type_name in pokemon.types:
+            self.by_type[type_name].add(pokemon_id)
+        for ability in pokemon.abilities:
+            self.by_ability[ability].add(pokemon_id)
+            self.ability_names[ability.lower()] = ability
+        self.by_role[role].add(pokemon_id)
+
+    def add_gender(self, gender: str, species_names: list[str]):
+        # Mirrors the live endpoints, which resolve each species as /pokemon/{species}
+        self.by_gender[gender] = {
+            self.ids_by_name[name] for name in species_names if name in self.ids_by_name
+        }
+
+    def query(self, gender: str = None, type_name: str = None, ability: str = None, role: str = None) -> set:
+        """returns the ids matching every given filter"""
+        selected = []
+        if gender is not None:
+            selected.append(self.by_gender.get(gender, set()))
+        if type_name is not None:
+            selected.append(self.by_type.get(type_name, set()))
+        if ability is not None:
+            selected.append(self.by_ability.get(self.ability_names.get(ability.lower()), set()))
+        if role is not None:
+            selected.append(self.by_role.get(role, set()))
+
+        if not selected:
+            return set(self.pokemon)
+        # Intersect smallest first so every step shrinks as fast as possible
+        selected.sort(key=len)
+        return set(selected[0]).intersection(*selected[1:])
+
+    def keys_overlapping(self, index: dict, ids: set) -> list[str]:
+        """returns the keys of `index` that share at least one id with `ids`"""
+        return sorted(key for key, key_ids in index.items() if not key_ids.isdisjoint(ids))
+
+    def records(self, ids) -> list[PokemonRecord]:
+        """returns the Pokemon for `ids`, in Pokedex order"""
+        return [self.pokemon[pokemon_id] for pokemon_id in sorted(ids)]
+
+    def __len__(self):
+        return len(self.pokemon)
+
+
+def build_index_from_snapshot(snapshot) -> PokedexIndex:
+    index = PokedexIndex()
+
+    payloads = [snapshot.resources[key] for key in snapshot.keys("pokemon")]
+    pokemon_list = [PokemonRecord.from_payload(payload) for payload in payloads]
+    roles = categorize_roles([pokemon.stats for pokemon in pokemon_list])
+    for pokemon, role in zip(pokemon_list, roles):
+        index.add_pokemon(pokemon.id, pokemon, role)
+
+    for key in snapshot.keys("gender"):
+        gender_data = snapshot.resources[key]
+        index.add_gender(
+            gender_data["name"],
+            [entry["pokemon_species"]["name"] for entry in gender_data.get("pokemon_species_details", [])],
+        )
+
+    return index
+
+
+_pokedex_index = None
+
+
+def get_pokedex_index():
+    """
+    returns the Pokedex index, or None when there is no complete data to build it from
+
+    Only the offline snapshot holds the whole Pokedex; the response cache only
+    holds whatever happened to be requested, so it can't answer a filter exactly.
+    """
+    global _pokedex_index
+
+    if _pokedex_index is None:
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            _pokedex_index = build_index_from_snapshot(snapshot)
+            logger.info("Built Pokedex index over %d Pokemon", len(_pokedex_index))
+    return _pokedex_index
@@ -0,0 +1,97 @@
+import copy
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+from rich.console import Console, ConsoleRenderable
+from rich.logging import RichHandler
+
+from .common import LOG_LEVEL, LOG_MODE, LOG_SAMPLE_RATE, PRETTY_OUTPUT
+
+# Records from every backend module, and the rich tables/panels shown through `show`
+logger = logging.getLogger("backend")
+pretty_logger = logging.getLogger("backend.pretty")
+
+_listener = None
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps every record at INFO or above and a random `rate` fraction of DEBUG records."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class RenderableQueueHandler(QueueHandler):
+    """Queue handler that passes rich renderables through unformatted, for the listener to draw."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if isinstance(record.msg, ConsoleRenderable):
+            record = copy.copy(record)
+            record.exc_info = None
+            return record
+        return super().prepare(record)
+
+
+class ConsoleHandler(RichHandler):
+    """RichHandler that draws rich renderables as-is instead of as a log line."""
+
+    def emit(self, record: logging.LogRecord):
+        if isinstance(record.msg, ConsoleRenderable):
+            self.console.print(record.msg)
+        else:
+            super().emit(record)
+
+
+def configure_logging(mode: str = LOG_MODE, level: str = LOG_LEVEL, sample_rate: float = LOG_SAMPLE_RATE):
+    """
+    Routes the "backend" loggers to the terminal.
+
+    In "queue" mode records are put on an unbounded queue and written by a
+    QueueListener thread, so a log call on the request path costs a queue
+    put rather than terminal I/O. In "console" mode they are written on the
+    calling thread. Call `stop_logging` on shutdown to flush the queue.
+
+    Args:
+        mode: "queue" or "console"
+        level: Lowest level that is logged, e.g. "INFO"
+        sample_rate: Fraction of DEBUG records to keep
+    """
+    global _listener
+
+    stop_logging()
+    console_handler = ConsoleHandler(console=Console(), show_path=False)
+    if mode == "queue":
+        handler = RenderableQueueHandler(queue.SimpleQueue())
+        _listener = QueueListener(handler.queue, console_handler)
+        _listener.start()
+    else:
+        handler = console_handler
+    handler.addFilter(SamplingFilter(sample_rate))
+
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    # Pretty output is switched by PRETTY_OUTPUT, not by the log level
+    pretty_logger.setLevel(logging.INFO)
+    pretty_logger.disabled = not PRETTY_OUTPUT
+
+
+def stop_logging():
+    """Stops the background listener, writing out whatever is still queued."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def show(renderable):
+    """Shows a rich table, panel or rule when pretty output is on."""
+    if PRETTY_OUTPUT:
+        pretty_logger.info(renderable)
@@ -1,258 +1,393 @@
-from fastapi import FastAPI
+import asyncio
+import hmac
+import logging
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import httpx
-from .common import api_url_build
+from .batch import BatchQuery, BatchRequest, SharedHydration, resolve, run_batch
+from .cache import close_response_cache, get_response_cache
+from .categorizer_pool import start_zig_pool, stop_zig_pool
+from .conditional import ConditionalMiddleware
+from .deadlines import BudgetExhausted, DeadlineMiddleware, is_partial, mark_partial
+from .common import (
+    CACHE_ADMIN_TOKEN,
+    CATEGORIZER_BACKEND,
+    PRETTY_OUTPUT,
+    POKEMON_LIMIT,
+    POKEMON_MAX_LIMIT,
+    TIME_TYPE_POOLS,
+    api_url_build,
+    decode_cursor,
+    encode_cursor,
+)
+from .indexes import get_pokedex_index
+from .logs import configure_logging, show, stop_logging
+from .records import RECORD_FIELDS, PokemonRef, dump_records, needs_hydration, parse_fields
+from .metrics import (
+    CACHE_HIT_RATIO,
+    CACHE_LOOKUPS,
+    RequestDurationMiddleware,
+    register_collector,
+    render_metrics,
+    run_event_loop_probe,
+)
+from .refresh import run_hot_key_refresher
+from .role_stats import get_role_stats, run_role_stats_pipeline
+from .similarity import get_stat_index
+from .time_pools import run_time_pool_warmer, sample_time_pool
+from .snapshot import get_snapshot
+from .sprites import SPRITE_PATH, SpriteResponse, fetch_sprite
 from backend.helper_functions import (
-    fetch_pokemon_data,
+    create_http_client,
+    fetch_json,
+    fetch_pokemon_many,
+    fetch_pokemon_page,
+    iter_pokemon_as_completed,
+    upstream_flight,
     fetch_all_pokemon_of_type,
-    categorize_pokemon_role
 )
-from rich.console import Console
 from rich.panel import Panel
+from rich.rule import Rule
 from rich.table import Table
 from rich import print as rprint
+import json
 import random
 from datetime import datetime
 
-console = Console()
-
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    # One pooled upstream client for the whole app lifetime
+    app.state.http_client = create_http_client()
+    get_response_cache()
+    get_snapshot()
+    get_pokedex_index()
+    get_stat_index()
+    if CATEGORIZER_BACKEND == "zig":
+        try:
+            await start_zig_pool()
+        except (OSError, RuntimeError) as e:
+            logger.error("Could not start the Zig categorizer (%s), using the NumPy one instead", e)
+    refresher = asyncio.create_task(run_hot_key_refresher(app.state.http_client))
+    time_pool_warmer = asyncio.create_task(run_time_pool_warmer(app.state.http_client))
+    event_loop_probe = asyncio.create_task(run_event_loop_probe())
+    role_stats_pipeline = asyncio.create_task(run_role_stats_pipeline(app.state.http_client))
+    try:
+        yield
+    finally:
+        refresher.cancel()
+        time_pool_warmer.cancel()
+        event_loop_probe.cancel()
+        role_stats_pipeline.cancel()
+        await app.state.http_client.aclose()
+        close_response_cache()
+        await stop_zig_pool()
+        stop_logging()
+
+app = FastAPI(lifespan=lifespan)
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
+
+class Page:
+    """Common `limit` / `cursor` query parameters for paginated listings."""
+
+    def __init__(
+        self,
+        limit: int = Query(POKEMON_LIMIT, ge=1, le=POKEMON_MAX_LIMIT),
+        cursor: str = None,
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+    def offset(self) -> int:
+        return decode_cursor(self.cursor)
+
+    def set_next(self, response: Response, request: Request, offset: int, total: int):
+        """Points the `X-Next-Cursor` and `Link` headers at the following page, if any."""
+        if offset + self.limit >= total:
+            return
+        self.set_next_cursor(response, request, encode_cursor(offset + self.limit))
+
+    def set_next_cursor(self, response: Response, request: Request, next_cursor: str):
+        next_url = request.url.include_query_params(limit=self.limit, cursor=next_cursor)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+class Fields:
+    """Common `fields` query parameter: comma-separated Pokemon attributes to serialize."""
+
+    def __init__(self, fields: str = None):
+        self.fields = fields
+
+    def selected(self, default: tuple = RECORD_FIELDS) -> tuple:
+        """
+        returns the requested fields in response order, or `default` when none were asked for
+
+        Raises:
+            ValueError: On a field Pokemon don't have
+        """
+        return parse_fields(self.fields, default)
+
+async def iter_records(pokemon_list: list):
+    for pokemon in pokemon_list:
+        yield pokemon
+
+async def fetch_listing_page(client: httpx.AsyncClient, pokemon_names: list[str], offset: int, limit: int, fields: tuple) -> list:
+    """
+    Pokemon on one page of a type or gender listing.
+
+    When `fields` only asks for what the listing already holds, the page is
+    answered from the names alone, without a fetch per Pokemon.
+    """
+    if not needs_hydration(fields):
+        return [PokemonRef(name) for name in pokemon_names[offset:offset + limit]]
+    pokemon_urls = [api_url_build("pokemon", name) for name in pokemon_names]
+    return await fetch_pokemon_page(client, pokemon_urls, offset, limit)
+
+def stream_listing_page(client: httpx.AsyncClient, pokemon_names: list[str], offset: int, limit: int, fields: tuple):
+    """Like `fetch_listing_page`, but yields the Pokemon in completion order."""
+    page_names = pokemon_names[offset:offset + limit]
+    if not needs_hydration(fields):
+        return iter_records([PokemonRef(name) for name in page_names])
+    return iter_pokemon_as_completed(client, [api_url_build("pokemon", name) for name in page_names])
+
+def records_response(pokemon_list: list, fields: tuple = None) -> Response:
+    """Answers with a JSON array of Pokemon records, serialized without going through jsonable_encoder."""
+    return Response(dump_records(pokemon_list, fields), media_type="application/json")
+
+async def resolve_route(client: httpx.AsyncClient, query: BatchQuery, request: Request = None, page: Page = None) -> Response:
+    """Answers a GET route with the batch resolver for the same query kind, so the two can't drift apart."""
+    body, next_cursor = await resolve(SharedHydration(client), query)
+    response = Response(body, media_type="application/json")
+    if next_cursor is not None:
+        page.set_next_cursor(response, request, next_cursor)
+    return response
+
+def ndjson_response(pokemon_stream, fields: tuple = None) -> StreamingResponse:
+    """
+    Streams Pokemon as newline-delimited JSON, one record per line, as they are produced.
+
+    The headers are sent before the stream knows whether the request budget
+    will cut it short, so a stream that was ends with a `{"partial":true}` line.
+    """
+    async def lines():
+        async for pokemon in pokemon_stream:
+            yield pokemon.to_json(fields) + b"\n"
+        if is_partial():
+            yield b'{"partial":true}\n'
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 origins = [
     "http://localhost:3000",
 ]
 
+# Per-request upstream budget; innermost, so X-Partial is set before the ETag is computed
+app.add_middleware(DeadlineMiddleware)
+
+# ETags, 304s and compression; inside CORS so 304s get the CORS headers too
+app.add_middleware(ConditionalMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "ETag", "X-Partial"],
 )
 
-@app.get("/pokemon-by-gender/{gender_choice}")
-async def get_pokemon_by_gender(gender_choice: str):
-    console.rule(f"[bold blue]Fetching Pokemon by Gender: {gender_choice}")
-    
-    gender_url = api_url_build("gender", gender_choice.lower())
-    console.print(f"[dim]API URL: {gender_url}[/dim]")
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(gender_url)
-        if response.status_code != 200:
-            console.print("[bold red]Error:[/bold red] Failed to fetch gender data")
-            return {"error": "Failed to fetch gender data"}
+app.add_middleware(RequestDurationMiddleware)
 
-        gender_data = response.json()
-        pokemon_entries = gender_data.get("pokemon_species_details", [])
+def collect_cache_metrics():
+    cache = get_response_cache()
+    if cache is None:
+        return
+    stats = cache.stats()
+    for result in ("hits_memory", "hits_disk", "hits_stale", "misses"):
+        CACHE_LOOKUPS.set(stats[result], result=result)
+    CACHE_HIT_RATIO.set(stats["hit_ratio"])
 
-        pokemon_list = []
-        for entry in pokemon_entries[:20]:  # Limit to 20 for speed
-            species_name = entry["pokemon_species"]["name"]
-            pokemon_url = f"https://pokeapi.co/api/v2/pokemon/{species_name}"
-            
-            pokemon_data = await fetch_pokemon_data(pokemon_url)
-            if pokemon_data:
-                pokemon_list.append(pokemon_data)
+register_collector(collect_cache_metrics)
 
-        return pokemon_list
+@app.get("/pokemon-by-gender/{gender_choice}")
+async def get_pokemon_by_gender(gender_choice: str, request: Request, page: Page = Depends(), fields: Fields = Depends(), client: httpx.AsyncClient = Depends(get_http_client)):
+    show(Rule(f"[bold blue]Fetching Pokemon by Gender: {gender_choice}"))
+    query = BatchQuery(kind="pokemon-by-gender", gender=gender_choice, limit=page.limit, cursor=page.cursor, fields=fields.fields)
+    return await resolve_route(client, query, request, page)
     
-# refine gender choice by narrowing down via types
+
 @app.get("/pokemon-by-type/{type_choice}")
-async def get_pokemon_by_type(type_choice: str):
-    console.rule(f"[bold green]Fetching Pokemon by Type: {type_choice}")
+async def get_pokemon_by_type(type_choice: str, request: Request, page: Page = Depends(), fields: Fields = Depends(), client: httpx.AsyncClient = Depends(get_http_client)):
+    show(Rule(f"[bold green]Fetching Pokemon by Type: {type_choice}"))
+
+    try:
+        offset = page.offset()
+        selected = fields.selected()
+    except ValueError as e:
+        return {"error": str(e)}
+
+    index = get_pokedex_index()
+    if index is not None:
+        if type_choice.lower() not in index.by_type:
+            return {"error": "Failed to fetch type data"}
+        pokemon_list = index.records(index.query(type_name=type_choice.lower()))
+        response = records_response(pokemon_list[offset:offset + page.limit], selected)
+        page.set_next(response, request, offset, len(pokemon_list))
+        return response
     
     type_url = api_url_build("type", type_choice.lower())
-    console.print(f"[dim]API URL: {type_url}[/dim]")
+    logger.debug("API URL: %s", type_url)
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(type_url)
-        if response.status_code != 200:
-            console.print("[bold red]Error:[/bold red] Failed to fetch type data")
-            return {"error": "Failed to fetch type data"}
-            
-        type_data = response.json()
-        pokemon_entries = type_data.get("pokemon", [])
-
+    try:
+        type_data = await fetch_json(client, type_url)
+    except BudgetExhausted:
+        mark_partial()
+        return records_response([])
+    except httpx.HTTPError:
+        logger.error("Failed to fetch type data")
+        return {"error": "Failed to fetch type data"}
+
+    pokemon_entries = type_data.get("pokemon", [])
+
+    pokemon_names = [entry["pokemon"]["name"] for entry in pokemon_entries]
+    pokemon_list = await fetch_listing_page(client, pokemon_names, offset, page.limit, selected)
+    response = records_response(pokemon_list, selected)
+    page.set_next(response, request, offset, len(pokemon_names))
+
+    if PRETTY_OUTPUT and needs_hydration(selected):
         # Create a table for displaying Pokemon data
         table = Table(title=f"Pokemon of Type: {type_choice}")
         table.add_column("Name", style="cyan")
         table.add_column("Types", style="green")
         table.add_column("Abilities", style="yellow")
+        for pokemon in pokemon_list:
+            table.add_row(
+                pokemon.name,
+                ", ".join(pokemon.types),
+                ", ".join(pokemon.abilities)
+            )
+        show(table)
 
-        pokemon_list = []
-        with console.status("[bold green]Fetching Pokemon details...") as status:
-            for entry in pokemon_entries[:20]:
-                species_name = entry["pokemon"]["name"]
-                pokemon_url = f"https://pokeapi.co/api/v2/pokemon/{species_name}"
-                
-                pokemon_data = await fetch_pokemon_data(pokemon_url)
-                if pokemon_data:
-                    pokemon_list.append(pokemon_data)
-                    table.add_row(
-                        pokemon_data["name"],
-                        ", ".join(pokemon_data["types"]),
-                        ", ".join(pokemon_data["abilities"])
-                    )
-
-        console.print(table)
-        return pokemon_list
+    return response
 
 @app.get("/pokemon-by-gender/{gender_choice}/filter/{type_choice}")
-async def filter_gender_pokemon_by_type(gender_choice: str, type_choice: str):
-    # First get the gender-specific pokemon
-    gender_url = api_url_build("gender", gender_choice.lower())
-    async with httpx.AsyncClient() as client:
-        response = await client.get(gender_url)
-        if response.status_code != 200:
-            return {"error": "Failed to fetch gender data"}
-
-        gender_data = response.json()
-        pokemon_entries = gender_data.get("pokemon_species_details", [])
-
-        # Get all pokemon for this gender first
-        pokemon_list = []
-        for entry in pokemon_entries[:20]:  # Limit to 20 for speed
-            species_name = entry["pokemon_species"]["name"]
-            pokemon_url = f"https://pokeapi.co/api/v2/pokemon/{species_name}"
-            
-            pokemon_data = await fetch_pokemon_data(pokemon_url)
-            if pokemon_data:
-                pokemon_list.append(pokemon_data)
-
-        # Now filter the pokemon_list by type
-        filtered_list = [
-            pokemon for pokemon in pokemon_list 
-            if type_choice.lower() in pokemon["types"]
-        ]
-
-        return filtered_list
+async def filter_gender_pokemon_by_type(gender_choice: str, type_choice: str, request: Request, page: Page = Depends(), fields: Fields = Depends(), client: httpx.AsyncClient = Depends(get_http_client)):
+    # Without an index the cursor walks the gender listing, so a page can hold fewer than `limit` matches
+    query = BatchQuery(
+        kind="filter-by-type", gender=gender_choice, type=type_choice, limit=page.limit, cursor=page.cursor, fields=fields.fields
+    )
+    return await resolve_route(client, query, request, page)
 
 @app.get("/available-types/{gender_choice}")
-async def get_available_types(gender_choice: str):
-    # First get the gender-specific pokemon
-    gender_url = api_url_build("gender", gender_choice.lower())
-    async with httpx.AsyncClient() as client:
-        response = await client.get(gender_url)
-        if response.status_code != 200:
-            return {"error": "Failed to fetch gender data"}
-
-        gender_data = response.json()
-        pokemon_entries = gender_data.get("pokemon_species_details", [])
-
-        # Get all pokemon for this gender
-        available_types = set()
-        for entry in pokemon_entries[:20]:  # Limit to 20 for speed
-            species_name = entry["pokemon_species"]["name"]
-            pokemon_url = f"https://pokeapi.co/api/v2/pokemon/{species_name}"
-            
-            pokemon_data = await fetch_pokemon_data(pokemon_url)
-            if pokemon_data:
-                available_types.update(pokemon_data["types"])
-
-        return list(available_types)
+async def get_available_types(gender_choice: str, client: httpx.AsyncClient = Depends(get_http_client)):
+    return await resolve_route(client, BatchQuery(kind="available-types", gender=gender_choice))
 
 @app.get("/pokemon-roles/{gender_choice}")
-async def get_pokemon_roles(gender_choice: str):
-    console.rule(f"[bold magenta]Categorizing Pokemon Roles for Gender: {gender_choice}")
-    
-    gender_url = api_url_build("gender", gender_choice.lower())
-    console.print(f"[dim]API URL: {gender_url}[/dim]")
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(gender_url)
-        if response.status_code != 200:
-            console.print("[bold red]Error:[/bold red] Failed to fetch gender data")
-            return {"error": "Failed to fetch gender data"}
-
-        gender_data = response.json()
-        pokemon_entries = gender_data.get("pokemon_species_details", [])
-
-        role_categories = {
-            "Tank": [],
-            "Attacker": [],
-            "Support": [],
-            "Speedster": []
-        }
-
-        with console.status("[bold green]Analyzing Pokemon roles...") as status:
-            for entry in pokemon_entries[:20]:
-                species_name = entry["pokemon_species"]["name"]
-                pokemon_url = f"https://pokeapi.co/api/v2/pokemon/{species_name}"
-                
-                pokemon_data = await fetch_pokemon_data(pokemon_url)
-                if pokemon_data:
-                    role = categorize_pokemon_role(pokemon_data["stats"])
-                    role_categories[role].append({
-                        "name": pokemon_data["name"],
-                        "sprite": pokemon_data["sprite"],
-                        "types": pokemon_data["types"],
-                        "stats": pokemon_data["stats"]
-                    })
-                    console.print(f"[dim]Categorized {pokemon_data['name']} as: [bold]{role}[/bold][/dim]")
-
-        # Display role distribution
-        for role, pokemon_list in role_categories.items():
+async def get_pokemon_roles(gender_choice: str, fields: Fields = Depends(), client: httpx.AsyncClient = Depends(get_http_client)):
+    show(Rule(f"[bold magenta]Categorizing Pokemon Roles for Gender: {gender_choice}"))
+    response = await resolve_route(client, BatchQuery(kind="pokemon-roles", gender=gender_choice, fields=fields.fields))
+
+    # Display role distribution
+    role_categories = json.loads(response.body) if PRETTY_OUTPUT else {}
+    if "error" not in role_categories:
+        for role, members in role_categories.items():
+            names = [pokemon.get("name", "?") for pokemon in members]
             panel = Panel(
-                f"Total Pokemon: {len(pokemon_list)}\n" +
-                "\n".join([f"• {p['name']}" for p in pokemon_list[:5]]) +
-                ("\n..." if len(pokemon_list) > 5 else ""),
+                f"Total Pokemon: {len(names)}\n" +
+                "\n".join([f"• {name}" for name in names[:5]]) +
+                ("\n..." if len(names) > 5 else ""),
                 title=f"[bold]{role}[/bold]",
                 border_style={"Tank": "blue", "Attacker": "red", "Support": "green", "Speedster": "yellow"}[role]
             )
-            console.print(panel)
+            show(panel)
 
-        return role_categories
+    return response
 
 @app.get("/available-abilities/{type_choice}")
-async def get_available_abilities(type_choice: str):
+async def get_available_abilities(type_choice: str, client: httpx.AsyncClient = Depends(get_http_client)):
     """Get all available abilities for Pokemon of a specific type."""
+    index = get_pokedex_index()
+    if index is not None:
+        if type_choice.lower() not in index.by_type:
+            return {"error": "Failed to fetch type data"}
+        return index.keys_overlapping(index.by_ability, index.query(type_name=type_choice.lower()))
+
     type_url = api_url_build("type", type_choice.lower())
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(type_url)
-        if response.status_code != 200:
-            return {"error": "Failed to fetch type data"}
-            
-        type_data = response.json()
-        pokemon_entries = type_data.get("pokemon", [])
+    try:
+        type_data = await fetch_json(client, type_url)
+    except BudgetExhausted:
+        mark_partial()
+        return []
+    except httpx.HTTPError:
+        return {"error": "Failed to fetch type data"}
+
+    pokemon_entries = type_data.get("pokemon", [])
 
-        available_abilities = set()
-        for entry in pokemon_entries[:20]:  # Limit to 20 for speed
-            pokemon_url = entry["pokemon"]["url"]
-            pokemon_data = await fetch_pokemon_data(pokemon_url)
-            if pokemon_data:
-                available_abilities.update(pokemon_data["abilities"])
+    pokemon_urls = [api_url_build("pokemon", entry["pokemon"]["name"]) for entry in pokemon_entries[:20]]  # Limit to 20 for speed
+    available_abilities = set()
+    for pokemon in await fetch_pokemon_many(client, pokemon_urls):
+        available_abilities.update(pokemon.abilities)
 
-        return list(available_abilities)
+    return list(available_abilities)
 
 @app.get("/pokemon-by-type/{type_choice}/filter/{ability}")
-async def filter_type_pokemon_by_ability(type_choice: str, ability: str):
+async def filter_type_pokemon_by_ability(type_choice: str, ability: str, request: Request, page: Page = Depends(), fields: Fields = Depends(), client: httpx.AsyncClient = Depends(get_http_client)):
     """Filter Pokemon of a specific type by ability."""
-    type_url = api_url_build("type", type_choice.lower())
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(type_url)
-        if response.status_code != 200:
+    try:
+        offset = page.offset()
+        selected = fields.selected()
+    except ValueError as e:
+        return {"error": str(e)}
+
+    index = get_pokedex_index()
+    if index is not None:
+        if type_choice.lower() not in index.by_type:
             return {"error": "Failed to fetch type data"}
-            
-        type_data = response.json()
-        pokemon_entries = type_data.get("pokemon", [])
+        filtered_pokemon = index.records(index.query(type_name=type_choice.lower(), ability=ability))
+        response = records_response(filtered_pokemon[offset:offset + page.limit], selected)
+        page.set_next(response, request, offset, len(filtered_pokemon))
+        return response
 
-        filtered_pokemon = []
-        for entry in pokemon_entries[:20]:  # Limit to 20 for speed
-            pokemon_url = entry["pokemon"]["url"]
-            pokemon_data = await fetch_pokemon_data(pokemon_url)
-            if pokemon_data and ability.lower() in [a.lower() for a in pokemon_data["abilities"]]:
-                filtered_pokemon.append(pokemon_data)
-
-        return filtered_pokemon
+    type_url = api_url_build("type", type_choice.lower())
+    
+    try:
+        type_data = await fetch_json(client, type_url)
+    except BudgetExhausted:
+        mark_partial()
+        return records_response([])
+    except httpx.HTTPError:
+        return {"error": "Failed to fetch type data"}
+
+    pokemon_entries = type_data.get("pokemon", [])
+
+    pokemon_urls = [api_url_build("pokemon", entry["pokemon"]["name"]) for entry in pokemon_entries]
+    pokemon_list = await fetch_pokemon_page(client, pokemon_urls, offset, page.limit)
+    filtered_pokemon = [
+        pokemon for pokemon in pokemon_list
+        if pokemon.has_ability(ability)
+    ]
+
+    response = records_response(filtered_pokemon, selected)
+    page.set_next(response, request, offset, len(pokemon_urls))
+    return response
 
 @app.get("/pokemon-by-time")
-async def get_pokemon_by_time():
+async def get_pokemon_by_time(fields: Fields = Depends(), client: httpx.AsyncClient = Depends(get_http_client)):
     """Get Pokemon based on the current time of day with optimized batch processing."""
     try:
-        console.rule("[bold purple]Fetching Time-based Random Pokemon")
+        selected = fields.selected()
+    except ValueError as e:
+        return {"error": str(e)}
+
+    try:
+        show(Rule("[bold purple]Fetching Time-based Random Pokemon"))
         
         # Get time period using dict mapping for O(1) lookup
         time_periods = {
@@ -264,45 +399,232 @@ async def get_pokemon_by_time():
         current_hour = datetime.now().hour
         time_of_day = next(period for hours, period in time_periods.items() if current_hour in hours)
         
-        console.print(f"[dim]Current time period: {time_of_day}[/dim]")
-        
-        # Map time periods to Pokemon types
-        type_pools = {
-            "morning": ["normal", "flying", "fairy"],
-            "day": ["fire", "grass", "ground"],
-            "evening": ["fighting", "poison", "psychic"],
-            "night": ["dark", "ghost", "dragon"]
-        }
+        logger.debug("Current time period: %s", time_of_day)
         
-        selected_type = random.choice(type_pools[time_of_day])
-        pokemon_list = await fetch_all_pokemon_of_type(selected_type, limit=20)
+        selected_type = random.choice(TIME_TYPE_POOLS[time_of_day])
+        # Sample from the warm in-memory pool; only hit upstream until it's warm
+        pokemon_list = sample_time_pool(selected_type, 20)
+        if not pokemon_list:
+            pokemon_list = await fetch_all_pokemon_of_type(client, selected_type, limit=20)
         
         if not pokemon_list:
-            console.print("[bold red]Warning:[/bold red] No Pokemon data fetched, using fallback type")
+            logger.warning("No Pokemon data fetched, using fallback type")
             # Try another type as fallback
-            fallback_type = random.choice(type_pools[time_of_day])
-            pokemon_list = await fetch_all_pokemon_of_type(fallback_type, limit=20)
-        
-        # Add time period to each Pokemon
-        for pokemon in pokemon_list:
-            pokemon["time_period"] = time_of_day
-        
-        result = {
-            "time_period": time_of_day,
-            "pokemon": pokemon_list
-        }
+            fallback_type = random.choice(TIME_TYPE_POOLS[time_of_day])
+            pokemon_list = await fetch_all_pokemon_of_type(client, fallback_type, limit=20)
         
         # Validate response data
-        if not result["pokemon"]:
+        if not pokemon_list:
             raise ValueError("No Pokemon data available")
-            
-        return result
+
+        # Add time period to each Pokemon
+        body = (
+            b'{"time_period":' + json.dumps(time_of_day).encode()
+            + b',"pokemon":' + dump_records(pokemon_list, selected, time_period=time_of_day)
+            + (b',"partial":true' if is_partial() else b"") + b"}"
+        )
+        return Response(body, media_type="application/json")
         
     except Exception as e:
-        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        logger.error("%s", e)
         # Return a valid response structure even in case of error
         return {
             "time_period": "day",  # fallback default
             "pokemon": []
         }
-    
+
+@app.post("/batch")
+async def batch_queries(batch: BatchRequest, client: httpx.AsyncClient = Depends(get_http_client)):
+    """
+    Answers several gender-page queries at once over one shared hydration.
+
+    Each query is keyed by a name of the caller's choosing and answered like
+    its GET route (`pokemon-by-gender`, `filter-by-type`, `available-types`,
+    `pokemon-roles`), under the same name in `results`. Listings with another
+    page get a cursor in `next_cursors`.
+    """
+    return Response(await run_batch(client, batch), media_type="application/json")
+
+@app.get("/sprites/{sprite_path:path}")
+async def get_sprite(sprite_path: str, client: httpx.AsyncClient = Depends(get_http_client)):
+    """A PokeAPI sprite (e.g. `pokemon/25.png`) from the local cache, downloaded into it on first request."""
+    if not SPRITE_PATH.match(sprite_path):
+        return Response(status_code=404)
+
+    try:
+        path = await fetch_sprite(client, sprite_path)
+    except httpx.HTTPError as e:
+        logger.error("Failed to fetch sprite %s: %s", sprite_path, e)
+        return Response(status_code=502)
+    if path is None:
+        return Response(status_code=404)
+    return SpriteResponse(path)
+
+async def similar_pokemon(client: httpx.AsyncClient, names: list[str], k: int, type_name: str, role: str) -> list:
+    """Nearest neighbours of each name, fetching (and so indexing) any Pokemon the stat index hasn't seen yet."""
+    index = get_stat_index()
+    missing = [name for name in names if name not in index.rows]
+    if missing:
+        await fetch_pokemon_many(client, [api_url_build("pokemon", name) for name in missing])
+    return index.nearest(names, k, type_name=type_name, role=role)
+
+def similar_json(neighbours: list, fields: tuple) -> bytes:
+    return b"[" + b",".join(pokemon.to_json(fields, distance=round(distance, 2)) for pokemon, distance in neighbours) + b"]"
+
+@app.get("/similar/{name}")
+async def get_similar_pokemon(
+    name: str,
+    k: int = Query(10, ge=1, le=50),
+    type_name: str = Query(None, alias="type"),
+    role: str = None,
+    fields: Fields = Depends(),
+    client: httpx.AsyncClient = Depends(get_http_client),
+):
+    """The `k` Pokemon closest to `name` by base stats, optionally only of one type or role, each with its `distance`."""
+    try:
+        selected = fields.selected()
+        (neighbours,) = await similar_pokemon(client, [name.lower()], k, type_name and type_name.lower(), role)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    if neighbours is None:
+        return {"error": f"Unknown Pokemon '{name}'"}
+    return Response(similar_json(neighbours, selected), media_type="application/json")
+
+@app.get("/similar")
+async def get_similar_pokemon_batch(
+    names: str,
+    k: int = Query(10, ge=1, le=50),
+    type_name: str = Query(None, alias="type"),
+    role: str = None,
+    fields: Fields = Depends(),
+    client: httpx.AsyncClient = Depends(get_http_client),
+):
+    """Batch version of /similar/{name}: `names` is comma-separated, answered as `{name: [...]}` in one pass."""
+    requested = list(dict.fromkeys(name.strip().lower() for name in names.split(",") if name.strip()))
+    if not requested or len(requested) > 50:
+        return {"error": "Give between 1 and 50 names"}
+
+    try:
+        selected = fields.selected()
+        results = await similar_pokemon(client, requested, k, type_name and type_name.lower(), role)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    body = b",".join(
+        json.dumps(name).encode() + b":" + (
+            similar_json(neighbours, selected) if neighbours is not None
+            else json.dumps({"error": f"Unknown Pokemon '{name}'"}, separators=(",", ":")).encode()
+        )
+        for name, neighbours in zip(requested, results)
+    )
+    return Response(b"{" + body + b"}", media_type="application/json")
+
+@app.get("/role-stats")
+async def get_role_stats_summary():
+    """How many Pokemon of the whole Pokedex each role has, and its share; `complete` once every Pokemon is included."""
+    return Response(get_role_stats().summary, media_type="application/json")
+
+@app.get("/role-stats/percentiles")
+async def get_role_stats_percentiles():
+    """Per role, the 10th/25th/50th/75th/90th percentile of each base stat."""
+    return Response(get_role_stats().percentiles, media_type="application/json")
+
+@app.get("/role-stats/by-type")
+async def get_role_stats_by_type():
+    """Per type, how many of its Pokemon each role has."""
+    return Response(get_role_stats().by_type, media_type="application/json")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters and sizes of the upstream response cache."""
+    cache = get_response_cache()
+    if cache is None:
+        return {"enabled": False, "coalesced": upstream_flight.coalesced}
+    return {"enabled": True, "coalesced": upstream_flight.coalesced, **cache.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request, upstream, cache, categorizer and event-loop metrics in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.delete("/cache")
+async def invalidate_cache(request: Request, key: str = None, prefix: str = None):
+    """
+    Invalidate one cache key (e.g. `pokemon/pikachu/`), a key prefix, or the whole cache.
+
+    Admin only: answers 404 unless POKEFLOW_CACHE_ADMIN_TOKEN is set, and 401
+    unless the request carries it as a bearer token.
+    """
+    if not CACHE_ADMIN_TOKEN:
+        return Response(status_code=404)
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), CACHE_ADMIN_TOKEN.encode()):
+        return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+
+    cache = get_response_cache()
+    if cache is not None:
+        await cache.invalidate(key=key, prefix=prefix)
+    return {"invalidated": key or prefix or "*"}
+
+@app.get("/stream/pokemon-by-gender/{gender_choice}")
+async def stream_pokemon_by_gender(gender_choice: str, request: Request, page: Page = Depends(), fields: Fields = Depends(), client: httpx.AsyncClient = Depends(get_http_client)):
+    """NDJSON version of /pokemon-by-gender: each Pokemon is sent as soon as its fetch completes."""
+    try:
+        offset = page.offset()
+        selected = fields.selected()
+    except ValueError as e:
+        return {"error": str(e)}
+
+    index = get_pokedex_index()
+    if index is not None:
+        if gender_choice.lower() not in index.by_gender:
+            return {"error": "Failed to fetch gender data"}
+        pokemon_list = index.records(index.query(gender=gender_choice.lower()))
+        response = ndjson_response(iter_records(pokemon_list[offset:offset + page.limit]), selected)
+        page.set_next(response, request, offset, len(pokemon_list))
+        return response
+
+    try:
+        gender_data = await fetch_json(client, api_url_build("gender", gender_choice.lower()))
+    except BudgetExhausted:
+        mark_partial()
+        return ndjson_response(iter_records([]))
+    except httpx.HTTPError:
+        return {"error": "Failed to fetch gender data"}
+
+    pokemon_names = [entry["pokemon_species"]["name"] for entry in gender_data.get("pokemon_species_details", [])]
+    response = ndjson_response(stream_listing_page(client, pokemon_names, offset, page.limit, selected), selected)
+    page.set_next(response, request, offset, len(pokemon_names))
+    return response
+
+@app.get("/stream/pokemon-by-type/{type_choice}")
+async def stream_pokemon_by_type(type_choice: str, request: Request, page: Page = Depends(), fields: Fields = Depends(), client: httpx.AsyncClient = Depends(get_http_client)):
+    """NDJSON version of /pokemon-by-type: each Pokemon is sent as soon as its fetch completes."""
+    try:
+        offset = page.offset()
+        selected = fields.selected()
+    except ValueError as e:
+        return {"error": str(e)}
+
+    index = get_pokedex_index()
+    if index is not None:
+        if type_choice.lower() not in index.by_type:
+            return {"error": "Failed to fetch type data"}
+        pokemon_list = index.records(index.query(type_name=type_choice.lower()))
+        response = ndjson_response(iter_records(pokemon_list[offset:offset + page.limit]), selected)
+        page.set_next(response, request, offset, len(pokemon_list))
+        return response
+
+    try:
+        type_data = await fetch_json(client, api_url_build("type", type_choice.lower()))
+    except BudgetExhausted:
+        mark_partial()
+        return ndjson_response(iter_records([]))
+    except httpx.HTTPError:
+        return {"error": "Failed to fetch type data"}
+
+    pokemon_names = [entry["pokemon"]["name"] for entry in type_data.get("pokemon", [])]
+    response = ndjson_response(stream_listing_page(client, pokemon_names, offset, page.limit, selected), selected)
+    page.set_next(response, request, offset, len(pokemon_names))
+    return response
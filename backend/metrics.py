@@ -0,0 +1,234 @@
+import asyncio
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from .common import SPRITE_URL
+
+# Latency buckets in seconds, from cache hits up to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_collectors = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = state[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        for key, (counts, total, count) in self._values.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": bound}, cumulative
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+def register_collector(collect):
+    """Registers a callable run just before every scrape, to refresh derived gauges."""
+    _collectors.append(collect)
+
+
+def render_metrics() -> str:
+    """returns every metric in the Prometheus text exposition format"""
+    for collect in _collectors:
+        collect()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_DURATION = Histogram(
+    "pokeflow_request_duration_seconds", "Time spent answering API requests.", ("method", "route", "status")
+)
+UPSTREAM_DURATION = Histogram(
+    "pokeflow_upstream_request_duration_seconds", "Time spent on PokeAPI requests.", ("endpoint", "status")
+)
+UPSTREAM_IN_FLIGHT = Gauge("pokeflow_upstream_in_flight", "PokeAPI requests currently in flight.")
+POKEMON_FETCH_DURATION = Histogram(
+    "pokeflow_pokemon_fetch_duration_seconds", "Time to fetch and transform one Pokemon, cache included."
+)
+FANOUT_DURATION = Histogram("pokeflow_fanout_duration_seconds", "Time spent in one concurrent fan-out.")
+FANOUT_ITEMS = Counter("pokeflow_fanout_items_total", "Items handed to fan-outs, by outcome.", ("outcome",))
+CATEGORIZER_DURATION = Histogram(
+    "pokeflow_categorizer_duration_seconds", "Time to categorize one batch of Pokemon.", ("backend",)
+)
+CATEGORIZER_POKEMON = Counter("pokeflow_categorizer_pokemon_total", "Pokemon categorized.", ("backend",))
+UPSTREAM_HEDGES = Counter(
+    "pokeflow_upstream_hedges_total", "Hedged duplicate PokeAPI requests, sent and won.", ("endpoint", "outcome")
+)
+PARTIAL_RESPONSES = Counter(
+    "pokeflow_partial_responses_total", "Responses cut short by the request budget.", ("route",)
+)
+CACHE_LOOKUPS = Gauge("pokeflow_cache_lookups", "Response cache lookups since start, by result.", ("result",))
+CACHE_HIT_RATIO = Gauge("pokeflow_cache_hit_ratio", "Fraction of response cache lookups that hit.")
+EVENT_LOOP_LAG = Gauge("pokeflow_event_loop_lag_seconds", "How late the last event loop probe woke up.")
+EVENT_LOOP_LAG_HISTOGRAM = Histogram("pokeflow_event_loop_lag_probe_seconds", "Event loop probe lateness.")
+
+
+def upstream_endpoint(url) -> str:
+    """returns the PokeAPI endpoint family of a url, e.g. "pokemon" or "type", or "sprites" for sprite downloads"""
+    if str(url).startswith(SPRITE_URL):
+        return "sprites"
+    parts = [part for part in httpx.URL(str(url)).path.split("/") if part]
+    # /api/v2/<endpoint>/...
+    return parts[2] if len(parts) > 2 else "other"
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps the upstream transport to time every PokeAPI request by endpoint family and status."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = upstream_endpoint(request.url)
+        status = "error"
+        UPSTREAM_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            UPSTREAM_IN_FLIGHT.dec()
+            UPSTREAM_DURATION.observe(time.perf_counter() - started, endpoint=endpoint, status=status)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class RequestDurationMiddleware:
+    """
+    ASGI middleware timing every request by method, route template and status.
+
+    Plain ASGI rather than an `@app.middleware("http")` function, so it times
+    the whole response, streamed bodies included, and passes every response
+    message (e.g. pathsend) through as-is.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            # Label by the route template, not the raw path, so /pokemon-by-type/fire and /water share a series
+            route = scope.get("route")
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=status,
+            )
+
+
+async def run_event_loop_probe(interval: float = 0.25):
+    """Measures event loop lag: how much later than asked a sleep wakes up. Runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
@@ -1,11 +1,14 @@
 const std = @import("std");
 
+// Longest single stat record (or one-shot input) we accept
+const max_record_len = 64 * 1024;
+
 const PokemonStat = struct {
     base_stat: i32,
-    effort: i32,
+    effort: i32 = 0,
     stat: struct {
         name: []const u8,
-        url: []const u8,
+        url: []const u8 = "",
     },
 };
 
@@ -54,26 +57,7 @@ fn processStats(input_stats: []PokemonStat) Stats {
     return stats;
 }
 
-pub fn main() !void {
-    var gpa = std.heap.GeneralPurposeAllocator(.{}){};
-    defer _ = gpa.deinit();
-    const allocator = gpa.allocator();
-
-    const stdin = std.io.getStdIn();
-    const stdout = std.io.getStdOut();
-
-    // Read JSON input
-    var buffer: [4096]u8 = undefined;
-    const len = try stdin.read(&buffer);
-    const input = buffer[0..len];
-
-    // Parse JSON
-    var parsed = try std.json.parseFromSlice(InputStats, allocator, input, .{});
-    defer parsed.deinit();
-
-    // Process the raw stats into our normalized format
-    const stats = processStats(parsed.value.stats);
-
+fn pickRole(stats: Stats) []const u8 {
     // Calculate role scores
     const scores = RoleScores{
         .Tank = stats.hp * 0.4 + stats.defense * 0.35 + stats.special_defense * 0.25,
@@ -95,5 +79,63 @@ pub fn main() !void {
         }
     }
 
-    try stdout.writer().print("{s}", .{max_role});
+    return max_role;
+}
+
+fn categorize(allocator: std.mem.Allocator, input: []const u8) ![]const u8 {
+    var parsed = try std.json.parseFromSlice(InputStats, allocator, input, .{ .ignore_unknown_fields = true });
+    defer parsed.deinit();
+
+    // Process the raw stats into our normalized format
+    return pickRole(processStats(parsed.value.stats));
+}
+
+// Worker mode: one JSON stat record per line on stdin, one role per line on
+// stdout, for as long as stdin stays open. Output is flushed whenever we have
+// drained everything buffered so far, so a caller streaming thousands of
+// records pays a write per pipe buffer rather than per record.
+fn runWorker(allocator: std.mem.Allocator) !void {
+    var buffered_in = std.io.bufferedReader(std.io.getStdIn().reader());
+    var buffered_out = std.io.bufferedWriter(std.io.getStdOut().writer());
+    const in = buffered_in.reader();
+    const out = buffered_out.writer();
+
+    while (true) {
+        if (buffered_in.start == buffered_in.end) try buffered_out.flush();
+
+        const line = (try in.readUntilDelimiterOrEofAlloc(allocator, '\n', max_record_len)) orelse break;
+        defer allocator.free(line);
+
+        const record = std.mem.trim(u8, line, " \t\r");
+        if (record.len == 0) continue;
+
+        // Always answer, even for a bad record, so replies stay aligned with requests
+        const role = categorize(allocator, record) catch "Support";
+        try out.print("{s}\n", .{role});
+    }
+
+    try buffered_out.flush();
+}
+
+pub fn main() !void {
+    var gpa = std.heap.GeneralPurposeAllocator(.{}){};
+    defer _ = gpa.deinit();
+    const allocator = gpa.allocator();
+
+    const args = try std.process.argsAlloc(allocator);
+    defer std.process.argsFree(allocator, args);
+
+    if (args.len > 1 and std.mem.eql(u8, args[1], "--worker")) {
+        return runWorker(allocator);
+    }
+
+    const stdin = std.io.getStdIn();
+    const stdout = std.io.getStdOut();
+
+    // Read JSON input
+    const input = try stdin.readToEndAlloc(allocator, max_record_len);
+    defer allocator.free(input);
+
+    const role = try categorize(allocator, input);
+    try stdout.writer().print("{s}", .{role});
 }
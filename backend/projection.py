@@ -0,0 +1,119 @@
+"""
+Parsing upstream payloads down to just the fields we read.
+
+A raw /pokemon payload is mostly `moves` and `game_indices`, which we throw
+away. Projection functions tagged with `@projects(...)` declare the top-level
+fields they read, and `read_projected` parses a response body for those
+fields only:
+
+- one-shot (default): the whole body is parsed (by orjson when installed,
+  otherwise json.loads) and the wanted fields are picked out of it. This is
+  no cheaper than a plain parse; it only keeps what is cached small.
+- streaming (POKEFLOW_STREAM_PARSE=1, needs ijson): the body is fed to an
+  incremental parser chunk by chunk as it arrives and only the wanted fields
+  are ever built. Peak memory per fetch is a fraction of the one-shot
+  parsers' (the body is never buffered either), at a higher CPU cost.
+"""
+
+import json
+
+import httpx
+
+from .common import STREAM_PARSE
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+if STREAM_PARSE and ijson is None:
+    raise ImportError("POKEFLOW_STREAM_PARSE=1 needs ijson (pip install -r requirements.txt)")
+
+def projects(*fields: str):
+    """Marks a projection function with the top-level payload fields it reads."""
+    def decorate(project):
+        project.fields = frozenset(fields)
+        return project
+    return decorate
+
+
+def loads_projected(content: bytes, fields: frozenset) -> dict:
+    """
+    Parses a JSON object, keeping only its top-level `fields`.
+
+    Raises:
+        ValueError: If `content` is not valid JSON
+    """
+    data = orjson.loads(content) if orjson is not None else json.loads(content)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    return {key: data[key] for key in fields if key in data}
+
+
+class StreamingProjector:
+    """Incremental JSON parser that only builds the given top-level fields of an object."""
+
+    def __init__(self, fields: frozenset):
+        self.fields = fields
+        self.result = {}
+        self._events = ijson.sendable_list()
+        self._parser = ijson.parse_coro(self._events)
+        self._key = None
+        self._builder = None
+
+    def feed(self, chunk: bytes):
+        self._parser.send(chunk)
+        self._consume()
+
+    def close(self) -> dict:
+        self._parser.close()
+        self._consume()
+        return self.result
+
+    def _consume(self):
+        for prefix, event, value in self._events:
+            if self._builder is not None:
+                self._builder.event(event, value)
+                if prefix == self._key and event in ("end_map", "end_array"):
+                    self.result[self._key] = self._builder.value
+                    self._builder = None
+            elif event == "map_key" and prefix == "":
+                self._key = value if value in self.fields else None
+            elif self._key is not None and prefix == self._key:
+                if event in ("start_map", "start_array"):
+                    self._builder = ijson.ObjectBuilder()
+                    self._builder.event(event, value)
+                else:
+                    self.result[self._key] = value
+        del self._events[:]
+
+
+async def read_projected(response: httpx.Response, fields: frozenset = None) -> dict:
+    """
+    Reads a (streamed) response body as JSON, parsing only `fields` when given.
+
+    Args:
+        response: Response opened with `client.stream(...)`
+        fields: Top-level fields to keep, or None for the whole payload
+
+    Raises:
+        ValueError: If the body is not valid JSON
+    """
+    if fields is None:
+        return json.loads(await response.aread())
+
+    if STREAM_PARSE:
+        projector = StreamingProjector(fields)
+        try:
+            async for chunk in response.aiter_bytes():
+                projector.feed(chunk)
+            return projector.close()
+        except ijson.JSONError as e:
+            raise ValueError(str(e)) from None
+
+    return loads_projected(await response.aread(), fields)
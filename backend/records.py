@@ -0,0 +1,185 @@
+import json
+from array import array
+from collections import OrderedDict
+
+from .categorizer import STAT_NAMES
+from .common import RECORD_JSON_CACHE_SIZE
+from .sprites import local_sprite_url
+
+
+class Interner:
+    """Maps names to small ints and back, so every distinct name is stored once."""
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self._ids_lower = {}
+
+    def intern(self, name: str) -> int:
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self._ids_lower.setdefault(name.lower(), name_id)
+        return name_id
+
+    def lookup(self, name: str, ignore_case: bool = False):
+        """returns the id of `name`, or None if it was never interned"""
+        if ignore_case:
+            return self._ids_lower.get(name.lower())
+        return self.ids.get(name)
+
+
+TYPE_NAMES = Interner()
+ABILITY_NAMES = Interner()
+
+# Attributes a Pokemon is serialized with, in response order
+RECORD_FIELDS = ("name", "types", "abilities", "stats", "sprite")
+# What a role breakdown serializes each Pokemon with by default
+ROLE_FIELDS = ("name", "sprite", "types", "stats")
+# The subset a type or gender listing already tells us, without fetching the Pokemon
+LISTING_FIELDS = frozenset({"name"})
+
+
+class PokemonRecord:
+    """
+    One hydrated Pokemon, as compact as we can keep it in memory.
+
+    Types and abilities are interned ids, stats a fixed-order (STAT_NAMES)
+    array of unsigned shorts, and the sprite points at our sprite cache.
+    Records are never mutated after they are built, so the full JSON
+    encoding of the most recently served Pokemon is kept in `_json_cache`
+    and reused; keeping it on every record would cost more than the record.
+    """
+
+    __slots__ = ("id", "name", "type_ids", "ability_ids", "stats", "sprite")
+
+    def __init__(self, pokemon_id: int, name: str, type_ids: tuple, ability_ids: tuple, stats: array, sprite: str):
+        self.id = pokemon_id
+        self.name = name
+        self.type_ids = type_ids
+        self.ability_ids = ability_ids
+        self.stats = stats
+        self.sprite = sprite
+
+    @classmethod
+    def from_payload(cls, data: dict):
+        """Builds a record from a cached (compact, see `project_pokemon_payload`) or upstream-shaped /pokemon payload."""
+        if "sprite" in data:
+            return cls(
+                data.get("id"),
+                data["name"],
+                tuple(TYPE_NAMES.intern(type_name) for type_name in data["types"]),
+                tuple(ABILITY_NAMES.intern(ability) for ability in data["abilities"]),
+                array("H", data["stats"]),
+                local_sprite_url(data["sprite"]),
+            )
+
+        base_stats = {s["stat"]["name"]: s["base_stat"] for s in data["stats"]}
+        return cls(
+            data.get("id"),
+            data["name"],
+            tuple(TYPE_NAMES.intern(t["type"]["name"]) for t in data["types"]),
+            tuple(ABILITY_NAMES.intern(a["ability"]["name"]) for a in data["abilities"]),
+            array("H", [base_stats.get(stat_name, 0) for stat_name in STAT_NAMES]),
+            local_sprite_url(data["sprites"]["front_default"]),
+        )
+
+    @property
+    def types(self) -> list[str]:
+        return [TYPE_NAMES.names[type_id] for type_id in self.type_ids]
+
+    @property
+    def abilities(self) -> list[str]:
+        return [ABILITY_NAMES.names[ability_id] for ability_id in self.ability_ids]
+
+    def has_type(self, type_name: str) -> bool:
+        type_id = TYPE_NAMES.lookup(type_name)
+        return type_id is not None and type_id in self.type_ids
+
+    def has_ability(self, ability: str) -> bool:
+        """case-insensitive"""
+        ability_id = ABILITY_NAMES.lookup(ability, ignore_case=True)
+        return ability_id is not None and ability_id in self.ability_ids
+
+    def stats_dict(self) -> dict:
+        return dict(zip(STAT_NAMES, self.stats))
+
+    def get_field(self, field: str):
+        if field == "stats":
+            return self.stats_dict()
+        return getattr(self, field)
+
+    def to_dict(self, fields: tuple = RECORD_FIELDS, **extra) -> dict:
+        """returns the Pokemon shape our API responds with, limited to `fields`, plus any `extra` fields"""
+        return {**{field: self.get_field(field) for field in fields}, **extra}
+
+    def to_json(self, fields: tuple = None, **extra) -> bytes:
+        if fields is not None and fields != RECORD_FIELDS:
+            return json.dumps(self.to_dict(fields, **extra), separators=(",", ":")).encode()
+
+        cached = _json_cache.get(self.name)
+        if cached is not None and cached[0] is self:
+            encoded = cached[1]
+            _json_cache.move_to_end(self.name)
+        else:
+            # A newer record of the same Pokemon replaces the old one's encoding
+            encoded = json.dumps(self.to_dict(), separators=(",", ":")).encode()
+            _json_cache[self.name] = (self, encoded)
+            _json_cache.move_to_end(self.name)
+            if len(_json_cache) > RECORD_JSON_CACHE_SIZE:
+                _json_cache.popitem(last=False)
+        if not extra:
+            return encoded
+        # Splice the extra fields into the cached object instead of re-encoding it
+        return encoded[:-1] + b"," + json.dumps(extra, separators=(",", ":")).encode()[1:]
+
+
+# Pokemon name -> (record, its full JSON encoding), for the RECORD_JSON_CACHE_SIZE most recently serialized Pokemon
+_json_cache = OrderedDict()
+
+
+class PokemonRef:
+    """
+    A Pokemon known only by name, straight from a type or gender listing.
+
+    Stands in for a PokemonRecord when a response asks for LISTING_FIELDS
+    only, so answering it doesn't need a fetch per Pokemon.
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def to_dict(self, fields: tuple = ("name",), **extra) -> dict:
+        return {"name": self.name, **extra}
+
+    def to_json(self, fields: tuple = None, **extra) -> bytes:
+        return json.dumps(self.to_dict(fields, **extra), separators=(",", ":")).encode()
+
+
+def parse_fields(fields: str, default: tuple = RECORD_FIELDS) -> tuple:
+    """
+    returns the comma-separated `fields` in response order, or `default` when none were asked for
+
+    Raises:
+        ValueError: On a field Pokemon don't have
+    """
+    if not fields:
+        return default
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    for field in requested:
+        if field not in RECORD_FIELDS:
+            raise ValueError(f"Unknown field '{field}'")
+    return tuple(field for field in RECORD_FIELDS if field in requested)
+
+
+def needs_hydration(fields: tuple) -> bool:
+    """returns whether serializing `fields` takes more than a listing provides"""
+    return not LISTING_FIELDS.issuperset(fields)
+
+
+def dump_records(records, fields: tuple = None, **extra) -> bytes:
+    """Serializes records as a JSON array of `fields` (all of them by default), adding `extra` fields to every one."""
+    return b"[" + b",".join(record.to_json(fields, **extra) for record in records) + b"]"
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+
+import httpx
+
+from .cache import get_response_cache
+from .common import (
+    REFRESH_AHEAD,
+    REFRESH_INTERVAL,
+    REFRESH_TOP_KEYS,
+    SNAPSHOT_OFFLINE,
+    TIME_TYPE_POOLS,
+    api_url_from_cache_uri,
+    cache_uri_build,
+)
+from .helper_functions import fan_out, fetch_upstream, project_pokemon_payload
+from .snapshot import get_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Always kept warm, however often they were requested: /pokemon-by-time's type pools
+PINNED_KEYS = [cache_uri_build("type", type_name) for pool in TIME_TYPE_POOLS.values() for type_name in pool]
+
+
+def projection_for(key: str):
+    return project_pokemon_payload if key.startswith(cache_uri_build("pokemon")) else None
+
+
+async def refresh_hot_keys(client: httpx.AsyncClient, top_n: int = REFRESH_TOP_KEYS, ahead: float = REFRESH_AHEAD) -> int:
+    """
+    Re-fetches the most requested cache keys that are stale or about to go stale.
+
+    Args:
+        client: Shared upstream HTTP client
+        top_n: How many of the hottest keys to consider
+        ahead: Refresh keys this many seconds before they would go stale
+
+    Returns:
+        int: Number of keys refreshed
+    """
+    cache = get_response_cache()
+    if cache is None or SNAPSHOT_OFFLINE:
+        return 0
+
+    snapshot = get_snapshot()
+    now = time.time()
+    due = {}
+    for key in dict.fromkeys(PINNED_KEYS + cache.hot_keys(top_n)):
+        if snapshot is not None and snapshot.get(key) is not None:
+            # Served from the snapshot, so never read from the cache
+            continue
+        stored_at = cache.peek_stored_at(key)
+        if stored_at is None or now - stored_at > cache.fresh_ttl - ahead:
+            due[key] = stored_at if stored_at is not None else 0.0
+
+    refreshed = await fan_out(
+        list(due),
+        lambda key: fetch_upstream(client, api_url_from_cache_uri(key), projection_for(key), due[key]),
+        deadline=None,
+    )
+    cache.decay_requests()
+    return len(refreshed)
+
+
+async def run_hot_key_refresher(client: httpx.AsyncClient, interval: float = REFRESH_INTERVAL):
+    """
+    Refreshes hot keys every `interval` seconds until cancelled, dropping
+    expired entries from the disk tier as it goes; does nothing in offline snapshot mode.
+    """
+    if SNAPSHOT_OFFLINE:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            refreshed = await refresh_hot_keys(client)
+            if refreshed:
+                logger.debug("Refreshed %d hot cache keys", refreshed)
+            cache = get_response_cache()
+            if cache is not None:
+                purged = await cache.purge_expired()
+                if purged:
+                    logger.debug("Purged %d expired cache entries", purged)
+        except Exception as e:
+            logger.error("Hot key refresh failed: %s", e)
@@ -0,0 +1,198 @@
+"""
+Role analytics over the entire Pokedex, served from memory.
+
+A background pipeline hydrates every Pokemon once (when there is no snapshot
+to read them from) into the stat index, whose matrix and vectorized role
+scores every aggregate is computed from in a few NumPy passes. Workers
+sharing a cache take turns through a lease, so only the first one fetches
+the Pokedex from upstream. The aggregates are recomputed whenever the index
+changed since the last pass, and kept pre-serialized, so /role-stats
+requests do no work.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+import numpy as np
+
+from .categorizer import ROLE_NAMES, STAT_NAMES
+from .cache import get_response_cache
+from .common import (
+    ROLE_STATS_CONCURRENCY,
+    ROLE_STATS_HYDRATE,
+    ROLE_STATS_HYDRATE_LEASE,
+    ROLE_STATS_INTERVAL,
+    api_url_build,
+)
+from .helper_functions import fan_out, fetch_json, fetch_pokemon_data
+from .indexes import get_pokedex_index
+from .records import TYPE_NAMES
+from .similarity import StatIndex, get_stat_index
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Lease in the shared cache's fill table; not a cache key, so no fetch ever claims it
+HYDRATE_LEASE_KEY = "role-stats/hydrate"
+
+
+class RoleStats:
+    """One pass of aggregates, each kept as the JSON body it is served as."""
+
+    __slots__ = ("version", "complete", "summary", "percentiles", "by_type")
+
+    def __init__(self, version: int, complete: bool, summary: bytes, percentiles: bytes, by_type: bytes):
+        self.version = version
+        self.complete = complete
+        self.summary = summary
+        self.percentiles = percentiles
+        self.by_type = by_type
+
+
+_role_stats = None
+# Whether every Pokemon upstream lists has been hydrated into the stat index
+_complete = False
+
+
+def dump(data) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def compute_role_stats(index: StatIndex) -> RoleStats:
+    """
+    Aggregates roles over every Pokemon in the stat index.
+
+    - summary: how many Pokemon each role has, and its share of the total
+    - percentiles: per role, the PERCENTILES of each stat
+    - by_type: per type, how many of its Pokemon each role has
+    """
+    version = index.version
+    matrix, roles, rows_by_type = index.arrays()
+    total = len(matrix)
+
+    counts = np.bincount(roles, minlength=len(ROLE_NAMES))
+    summary = {
+        "total": total,
+        "complete": _complete,
+        "computed_at": time.time(),
+        "roles": {
+            role: {"count": int(count), "share": round(float(count) / total, 4) if total else 0.0}
+            for role, count in zip(ROLE_NAMES, counts)
+        },
+    }
+
+    percentiles = {}
+    for role_index, role in enumerate(ROLE_NAMES):
+        role_matrix = matrix[roles == role_index]
+        if not len(role_matrix):
+            percentiles[role] = {}
+            continue
+        # (len(PERCENTILES), 6): one row per percentile, columns in STAT_NAMES order
+        values = np.percentile(role_matrix, PERCENTILES, axis=0)
+        percentiles[role] = {
+            stat_name: {f"p{p}": round(float(value), 1) for p, value in zip(PERCENTILES, values[:, column])}
+            for column, stat_name in enumerate(STAT_NAMES)
+        }
+
+    by_type = {}
+    for type_id, rows in rows_by_type.items():
+        if len(rows):
+            type_counts = np.bincount(roles[rows], minlength=len(ROLE_NAMES))
+            by_type[TYPE_NAMES.names[type_id]] = dict(zip(ROLE_NAMES, type_counts.tolist()))
+
+    return RoleStats(version, _complete, dump(summary), dump(percentiles), dump(dict(sorted(by_type.items()))))
+
+
+def get_role_stats() -> RoleStats:
+    """returns the latest aggregates, computing them now if the pipeline hasn't produced any yet"""
+    global _role_stats
+
+    if _role_stats is None:
+        _role_stats = compute_role_stats(get_stat_index())
+    return _role_stats
+
+
+def update_role_stats() -> bool:
+    """Recomputes the aggregates if the stat index changed since they were computed; returns whether it did."""
+    global _role_stats
+
+    index = get_stat_index()
+    if _role_stats is not None and (_role_stats.version, _role_stats.complete) == (index.version, _complete):
+        return False
+    _role_stats = compute_role_stats(index)
+    return True
+
+
+async def hydrate_pokedex(client: httpx.AsyncClient, concurrency: int = ROLE_STATS_CONCURRENCY) -> int:
+    """
+    Fetches every Pokemon upstream lists that the stat index doesn't know yet.
+
+    Fetches go through the response cache, so after the first run a restart
+    only reads them back from disk.
+
+    Returns:
+        int: Number of Pokemon hydrated
+    """
+    global _complete
+
+    listing = await fetch_json(client, f"{api_url_build('pokemon')}?limit=100000")
+    index = get_stat_index()
+    missing = [api_url_build("pokemon", entry["name"]) for entry in listing.get("results", []) if entry["name"] not in index.rows]
+    logger.info("Hydrating %d Pokemon for role stats", len(missing))
+
+    hydrated = await fan_out(missing, lambda url: fetch_pokemon_data(client, url), concurrency=concurrency, deadline=None)
+    _complete = len(hydrated) == len(missing)
+    return len(hydrated)
+
+
+async def hydrate_pokedex_once(client: httpx.AsyncClient, poll: float = 1.0) -> int:
+    """
+    Runs `hydrate_pokedex` while holding the shared cache's hydration lease.
+
+    Workers sharing a cache wait their turn, so only the first to get the
+    lease fetches the Pokedex from upstream; the ones after it find every
+    Pokemon in the shared cache and only read them into their own stat index.
+    Without a shared cache there is nothing to coordinate with.
+
+    Returns:
+        int: Number of Pokemon hydrated
+    """
+    cache = get_response_cache()
+    if cache is None or not cache.shared:
+        return await hydrate_pokedex(client)
+
+    while not await cache.claim_fill(HYDRATE_LEASE_KEY, ROLE_STATS_HYDRATE_LEASE):
+        await asyncio.sleep(poll)
+    try:
+        return await hydrate_pokedex(client)
+    finally:
+        await cache.release_fill(HYDRATE_LEASE_KEY)
+
+
+async def run_role_stats_pipeline(client: httpx.AsyncClient, interval: float = ROLE_STATS_INTERVAL):
+    """
+    Hydrates the whole Pokedex (unless the snapshot already holds it), then
+    recomputes the aggregates every `interval` seconds when the data changed.
+    Runs until cancelled.
+    """
+    global _complete
+
+    if get_pokedex_index() is not None:
+        _complete = True
+    elif ROLE_STATS_HYDRATE:
+        try:
+            await hydrate_pokedex_once(client)
+        except httpx.HTTPError as e:
+            logger.warning("Could not hydrate the Pokedex for role stats: %s", e)
+
+    while True:
+        try:
+            if update_role_stats():
+                logger.debug("Recomputed role stats over %d Pokemon", len(get_stat_index()))
+        except Exception as e:
+            logger.error("Role stats update failed: %s", e)
+        await asyncio.sleep(interval)
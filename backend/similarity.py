@@ -0,0 +1,213 @@
+"""
+"Pokemon like this one": nearest neighbours by base stats.
+
+Every Pokemon we know of (from the snapshot, the response cache, or fetched
+since startup) is packed into one (n, 6) matrix, columns in STAT_NAMES order
+like the categorizer's, and searched by Euclidean distance through scipy's
+cKDTree (a backend requirement; a vectorized NumPy scan stands in if it is
+missing). The matrix is float64, what cKDTree searches in, so queries never convert it.
+"""
+
+import logging
+from collections import defaultdict
+
+import numpy as np
+
+from .cache import get_response_cache
+from .categorizer import ROLE_NAMES, STAT_NAMES, score_roles
+from .indexes import get_pokedex_index
+from .records import TYPE_NAMES, PokemonRecord
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+logger = logging.getLogger(__name__)
+
+
+class StatIndex:
+    """
+    Nearest-neighbour search over the base stats of every known Pokemon.
+
+    New Pokemon are appended and changed ones patched in place; the matrix,
+    roles and KD-tree are brought up to date lazily, once per batch of
+    changes, on the next query. Queries filtered by type or role scan just
+    the matching rows, which beats over-fetching from the tree when the
+    filter is selective.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.rows = {}
+        # Bumped on every change, so aggregates over the index know when to recompute
+        self.version = 0
+        self._matrix = np.empty((0, len(STAT_NAMES)))
+        self._pending = []
+        self._dirty = False
+        self._tree = None
+        self._roles = np.empty(0, dtype=np.intp)
+        self._type_rows = defaultdict(list)
+        self._rows_by_type = {}
+
+    def add(self, pokemon: PokemonRecord):
+        row = self.rows.get(pokemon.name)
+        if row is None:
+            row = self.rows[pokemon.name] = len(self.records)
+            self.records.append(pokemon)
+            self._pending.append(pokemon.stats)
+            for type_id in pokemon.type_ids:
+                self._type_rows[type_id].append(row)
+            self._changed()
+            return
+
+        known = self.records[row]
+        self.records[row] = pokemon
+        if known.type_ids != pokemon.type_ids:
+            for type_id in known.type_ids:
+                self._type_rows[type_id].remove(row)
+            for type_id in pokemon.type_ids:
+                self._type_rows[type_id].append(row)
+                self._type_rows[type_id].sort()
+            self._changed()
+        if known.stats != pokemon.stats:
+            if row < len(self._matrix):
+                self._matrix[row] = pokemon.stats
+            else:
+                self._pending[row - len(self._matrix)] = pokemon.stats
+            self._changed()
+
+    def _changed(self):
+        self._dirty = True
+        self.version += 1
+
+    def refresh(self):
+        """Folds pending changes into the matrix and rebuilds the role, type and tree indexes."""
+        if not self._dirty:
+            return
+
+        if self._pending:
+            appended = np.array(self._pending, dtype=np.float64).reshape(len(self._pending), len(STAT_NAMES))
+            self._matrix = np.vstack([self._matrix, appended])
+            self._pending = []
+        self._roles = np.argmax(score_roles(self._matrix), axis=1)
+        self._rows_by_type = {type_id: np.array(rows, dtype=np.intp) for type_id, rows in self._type_rows.items()}
+
+        self._tree = cKDTree(self._matrix) if cKDTree is not None and len(self._matrix) else None
+        self._dirty = False
+
+    def arrays(self) -> tuple:
+        """returns the up-to-date (stats matrix, role index per row, {type_id: rows}) of the whole index"""
+        self.refresh()
+        return self._matrix, self._roles, self._rows_by_type
+
+    def candidates(self, type_name: str = None, role: str = None):
+        """
+        returns the rows allowed by the filters, or None when there are none
+
+        Raises:
+            ValueError: On a role that isn't one of ROLE_NAMES
+        """
+        selected = None
+        if type_name is not None:
+            type_id = TYPE_NAMES.lookup(type_name)
+            selected = self._rows_by_type.get(type_id, np.empty(0, dtype=np.intp))
+        if role is not None:
+            if role not in ROLE_NAMES:
+                raise ValueError(f"Unknown role '{role}'")
+            role_rows = np.flatnonzero(self._roles == ROLE_NAMES.index(role))
+            selected = role_rows if selected is None else np.intersect1d(selected, role_rows)
+        return selected
+
+    def nearest(self, names: list[str], k: int, type_name: str = None, role: str = None) -> list:
+        """
+        Finds the `k` Pokemon closest in stats to each of `names`, excluding the Pokemon itself.
+
+        Args:
+            names: Pokemon to search around; all are answered in one pass
+            k: Neighbours per Pokemon
+            type_name: Only consider Pokemon of this type
+            role: Only consider Pokemon of this role (see ROLE_NAMES)
+
+        Returns:
+            list: Per name, `[(PokemonRecord, distance), ...]` closest first,
+                or None for a name that isn't indexed
+
+        Raises:
+            ValueError: On an unknown role
+        """
+        self.refresh()
+        rows = [self.rows.get(name) for name in names]
+        known = [row for row in rows if row is not None]
+        candidates = self.candidates(type_name, role)
+        if not known:
+            return [None] * len(names)
+
+        points = self._matrix[known]
+        # One extra, since each Pokemon is its own nearest neighbour
+        count = min(k + 1, len(self.records) if candidates is None else len(candidates))
+        if count == 0:
+            neighbours = np.empty((len(known), 0), dtype=np.intp)
+            distances = np.empty((len(known), 0), dtype=np.float32)
+        elif candidates is None and self._tree is not None:
+            distances, neighbours = self._tree.query(points, k=count)
+            distances = distances.reshape(len(known), count)
+            neighbours = neighbours.reshape(len(known), count)
+        else:
+            pool = np.arange(len(self.records)) if candidates is None else candidates
+            pool_distances = np.sqrt(((self._matrix[pool][None, :, :] - points[:, None, :]) ** 2).sum(axis=2))
+            closest = np.argpartition(pool_distances, count - 1, axis=1)[:, :count]
+            order = np.take_along_axis(pool_distances, closest, axis=1).argsort(axis=1, kind="stable")
+            closest = np.take_along_axis(closest, order, axis=1)
+            distances = np.take_along_axis(pool_distances, closest, axis=1)
+            neighbours = pool[closest]
+
+        answers = iter(zip(known, neighbours, distances))
+        results = []
+        for row in rows:
+            if row is None:
+                results.append(None)
+                continue
+            own_row, row_neighbours, row_distances = next(answers)
+            results.append([
+                (self.records[neighbour], float(distance))
+                for neighbour, distance in zip(row_neighbours, row_distances)
+                if neighbour != own_row
+            ][:k])
+        return results
+
+    def __len__(self):
+        return len(self.records)
+
+
+def build_stat_index() -> StatIndex:
+    index = StatIndex()
+
+    pokedex = get_pokedex_index()
+    if pokedex is not None:
+        for pokemon in pokedex.records(pokedex.pokemon):
+            index.add(pokemon)
+        return index
+
+    # Without a snapshot, start from whatever Pokemon the response cache holds
+    cache = get_response_cache()
+    if cache is not None:
+        for data in cache.values("pokemon/"):
+            try:
+                index.add(PokemonRecord.from_payload(data))
+            except (KeyError, TypeError):
+                continue
+    return index
+
+
+_stat_index = None
+
+
+def get_stat_index() -> StatIndex:
+    """returns the process-wide stat index, seeding it from the snapshot or the response cache on first use"""
+    global _stat_index
+
+    if _stat_index is None:
+        _stat_index = build_stat_index()
+        logger.info("Built stat similarity index over %d Pokemon", len(_stat_index))
+    return _stat_index
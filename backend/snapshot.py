@@ -0,0 +1,212 @@
+"""
+Offline Pokedex snapshot.
+
+Crawl the PokeAPI resources we use into one compact, gzipped JSON file:
+
+    python -m backend.snapshot --output backend/.cache/snapshot.json.gz
+
+Then serve the app from it by pointing POKEFLOW_SNAPSHOT at the file (and set
+POKEFLOW_SNAPSHOT_OFFLINE=1 to never fall through to pokeapi.co).
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import time
+
+import httpx
+from rich.console import Console
+
+from .common import (
+    BASE_URL,
+    SNAPSHOT_ENDPOINTS,
+    SNAPSHOT_OFFLINE,
+    SNAPSHOT_PATH,
+    api_url_build,
+    cache_uri_build,
+)
+from .projection import read_projected
+
+console = Console()
+
+
+def project_named_payload(data: dict, *fields: str) -> dict:
+    return {"id": data.get("id"), "name": data["name"], **{field: data.get(field, []) for field in fields}}
+
+
+def snapshot_projections():
+    # Imported lazily: helper_functions itself reads the snapshot through get_snapshot()
+    from .helper_functions import trim_pokemon_payload
+
+    return {
+        "pokemon": trim_pokemon_payload,
+        "type": lambda data: project_named_payload(data, "pokemon"),
+        "gender": lambda data: project_named_payload(data, "pokemon_species_details"),
+        "ability": lambda data: project_named_payload(data, "pokemon"),
+        "stat": lambda data: project_named_payload(data, "is_battle_only", "game_index"),
+    }
+
+
+class Snapshot:
+    """Read-only view over a snapshot file, keyed like the response cache."""
+
+    def __init__(self, resources: dict, aliases: dict = None, created_at: float = None, base_url: str = BASE_URL):
+        self.resources = resources
+        self.aliases = aliases or {}
+        self.created_at = created_at
+        self.base_url = base_url
+
+    @classmethod
+    def load(cls, path: str):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["resources"], data.get("aliases"), data.get("created_at"), data.get("base_url", BASE_URL))
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "created_at": self.created_at,
+                    "base_url": self.base_url,
+                    "resources": self.resources,
+                    "aliases": self.aliases,
+                },
+                f,
+                separators=(",", ":"),
+            )
+
+    def get(self, key: str):
+        return self.resources.get(self.aliases.get(key, key))
+
+    def keys(self, endpoint: str) -> list[str]:
+        prefix = cache_uri_build(endpoint)
+        return [key for key in self.resources if key.startswith(prefix)]
+
+    def __len__(self):
+        return len(self.resources)
+
+
+class SnapshotMiss(httpx.RequestError):
+    """Raised in offline snapshot mode for a resource the snapshot doesn't hold."""
+
+
+_snapshot = None
+
+
+def get_snapshot():
+    """returns the loaded snapshot, or None when snapshot mode is off"""
+    global _snapshot
+
+    if _snapshot is None and SNAPSHOT_PATH:
+        _snapshot = Snapshot.load(SNAPSHOT_PATH)
+        console.print(f"[dim]Loaded snapshot with {len(_snapshot)} resources from {SNAPSHOT_PATH}[/dim]")
+    return _snapshot
+
+
+def snapshot_lookup(key: str):
+    """
+    Looks a cache key up in the snapshot.
+
+    Returns:
+        The snapshot payload, or None if snapshot mode is off or it's a miss
+
+    Raises:
+        SnapshotMiss: On a miss in offline mode
+    """
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None
+
+    data = snapshot.get(key) if key is not None else None
+    if data is None and SNAPSHOT_OFFLINE:
+        raise SnapshotMiss(f"'{key}' is not in the offline snapshot")
+    return data
+
+
+async def crawl_endpoint(client: httpx.AsyncClient, endpoint: str, project, concurrency: int) -> tuple[dict, dict]:
+    """
+    Crawls every resource of one endpoint.
+
+    Returns:
+        tuple[dict, dict]: Resources keyed by name, and id aliases pointing at them
+    """
+    from .helper_functions import fan_out
+
+    listing = await client.get(f"{api_url_build(endpoint)}?limit=100000")
+    listing.raise_for_status()
+    results = listing.json()["results"]
+    console.print(f"[dim]{endpoint}: crawling {len(results)} resources[/dim]")
+
+    async def fetch(entry):
+        try:
+            async with client.stream("GET", entry["url"]) as response:
+                response.raise_for_status()
+                return project(await read_projected(response, getattr(project, "fields", None)))
+        except httpx.HTTPError as e:
+            console.print(f"[red]✗[/red] {entry['url']}: {str(e)}")
+            return None
+
+    resources = {}
+    aliases = {}
+    for data in await fan_out(results, fetch, concurrency=concurrency, deadline=None):
+        key = cache_uri_build(endpoint, data["name"])
+        resources[key] = data
+        if data.get("id") is not None:
+            aliases[cache_uri_build(endpoint, data["id"])] = key
+
+    console.print(f"[green]✓[/green] {endpoint}: {len(resources)} of {len(results)} resources")
+    return resources, aliases
+
+
+async def build_snapshot(endpoints: list[str], concurrency: int) -> Snapshot:
+    from .helper_functions import create_http_client
+
+    projections = snapshot_projections()
+    resources = {}
+    aliases = {}
+    async with create_http_client() as client:
+        for endpoint in endpoints:
+            endpoint_resources, endpoint_aliases = await crawl_endpoint(
+                client, endpoint, projections[endpoint], concurrency
+            )
+            resources.update(endpoint_resources)
+            aliases.update(endpoint_aliases)
+    return Snapshot(resources, aliases, created_at=time.time())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.snapshot",
+        description=f"Crawl {BASE_URL} into a local snapshot file.",
+    )
+    parser.add_argument(
+        "--output",
+        default=SNAPSHOT_PATH or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "snapshot.json.gz"),
+        help="Where to write the gzipped snapshot",
+    )
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=list(SNAPSHOT_ENDPOINTS),
+        choices=list(SNAPSHOT_ENDPOINTS),
+        help="Endpoints to crawl",
+    )
+    parser.add_argument("--concurrency", type=int, default=20, help="Maximum in-flight upstream requests")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    snapshot = asyncio.run(build_snapshot(args.endpoints, args.concurrency))
+    snapshot.save(args.output)
+    console.print(
+        f"[bold green]Snapshot written:[/bold green] {len(snapshot)} resources to {args.output} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Local sprite cache.
+
+Sprites are kept under SPRITE_CACHE in the same layout as the PokeAPI sprites
+repository (see `sprite_filepath_build`) and served from /sprites/, so cards
+don't depend on raw.githubusercontent.com's latency. Missing sprites are
+fetched on first request (read-through); the whole cache can be filled ahead
+of time with:
+
+    python -m backend.sprites --first 1 --last 1025 --variants default shiny
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import time
+
+import httpx
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from .common import (
+    LOCAL_SPRITES,
+    SPRITE_BASE_URL,
+    SPRITE_CACHE,
+    SPRITE_MAX_AGE,
+    SPRITE_URL,
+    sprite_filepath_build,
+)
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Relative sprite paths we serve, e.g. pokemon/shiny/25.png; no "..", no absolute paths
+SPRITE_PATH = re.compile(r"^[\w\-]+(/[\w\-]+)*\.(png|gif|svg)$")
+
+# Sprite options accepted by `sprite_filepath_build`, by the name the prefetcher takes
+SPRITE_VARIANTS = {
+    "default": {},
+    "back": {"back": True},
+    "shiny": {"shiny": True},
+    "back-shiny": {"back": True, "shiny": True},
+    "female": {"female": True},
+    "official-artwork": {"other": True, "official_artwork": True},
+}
+
+# Concurrent requests for the same missing sprite share one download
+sprite_flight = SingleFlight()
+
+
+def sprite_path_from_url(url: str):
+    """returns the path of a sprite url relative to SPRITE_CACHE, or None if it isn't a PokeAPI sprite"""
+    if not url or not url.startswith(SPRITE_URL + "/"):
+        return None
+    relative_path = url[len(SPRITE_URL) + 1:]
+    return relative_path if SPRITE_PATH.match(relative_path) else None
+
+
+def local_sprite_url(url: str):
+    """returns where we serve a PokeAPI sprite from, or `url` unchanged when it isn't one (or LOCAL_SPRITES is off)"""
+    if not LOCAL_SPRITES:
+        return url
+    relative_path = sprite_path_from_url(url)
+    if relative_path is None:
+        return url
+    return f"{SPRITE_BASE_URL}/{relative_path}"
+
+
+def cached_sprite_path(relative_path: str):
+    """returns the file a sprite is cached in, or None if it isn't cached yet"""
+    path = os.path.join(SPRITE_CACHE, relative_path)
+    return path if os.path.isfile(path) else None
+
+
+def write_sprite(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so a concurrent reader never sees half a file
+    partial = f"{path}.{os.getpid()}.part"
+    with open(partial, "wb") as f:
+        f.write(content)
+    os.replace(partial, path)
+
+
+async def fetch_sprite(client: httpx.AsyncClient, relative_path: str):
+    """
+    Downloads one sprite into the cache, unless it's already there.
+
+    Returns:
+        str: The cached file, or None if upstream has no such sprite
+
+    Raises:
+        httpx.HTTPError: If the download fails
+    """
+    path = cached_sprite_path(relative_path)
+    if path is not None:
+        return path
+
+    async def download():
+        response = await client.get(f"{SPRITE_URL}/{relative_path}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        path = os.path.join(SPRITE_CACHE, relative_path)
+        await asyncio.to_thread(write_sprite, path, response.content)
+        return path
+
+    return await sprite_flight.do(relative_path, download)
+
+
+class SpriteResponse(FileResponse):
+    """
+    A cached sprite with long-lived cache headers.
+
+    When the server supports the ASGI pathsend extension, the file is handed
+    to the server to send (zero-copy where the server uses sendfile);
+    otherwise it is streamed like any FileResponse.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path, headers={"Cache-Control": f"public, max-age={SPRITE_MAX_AGE}, immutable"})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        ranged = any(name == b"range" for name, _ in scope["headers"])
+        if ranged or "http.response.pathsend" not in scope.get("extensions", {}):
+            await super().__call__(scope, receive, send)
+            return
+
+        stat_result = await asyncio.to_thread(os.stat, self.path)
+        self.set_stat_headers(stat_result)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+        else:
+            await send({"type": "http.response.pathsend", "path": self.path})
+
+
+async def prefetch_sprites(client: httpx.AsyncClient, relative_paths: list[str], concurrency: int) -> dict:
+    """
+    Fills the cache with many sprites, skipping those already cached.
+
+    Returns:
+        dict: How many sprites were `cached` before, `fetched`, `missing` upstream, and `failed`
+    """
+    from .helper_functions import fan_out
+
+    counts = {"cached": 0, "fetched": 0, "missing": 0, "failed": 0}
+
+    async def prefetch(relative_path):
+        if cached_sprite_path(relative_path) is not None:
+            counts["cached"] += 1
+            return
+        try:
+            path = await fetch_sprite(client, relative_path)
+        except httpx.HTTPError as e:
+            logger.warning("Failed to fetch sprite %s: %s", relative_path, e)
+            counts["failed"] += 1
+            return
+        counts["fetched" if path is not None else "missing"] += 1
+
+    await fan_out(relative_paths, prefetch, concurrency=concurrency, deadline=None)
+    return counts
+
+
+def main(argv=None):
+    from rich.console import Console
+
+    from .helper_functions import create_http_client
+
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.sprites",
+        description=f"Download Pokemon sprites into {SPRITE_CACHE}.",
+    )
+    parser.add_argument("--first", type=int, default=1, help="First Pokemon id")
+    parser.add_argument("--last", type=int, default=1025, help="Last Pokemon id")
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        default=["default"],
+        choices=list(SPRITE_VARIANTS),
+        help="Sprite variants to fetch for every Pokemon",
+    )
+    parser.add_argument("--concurrency", type=int, default=20, help="Maximum in-flight downloads")
+    args = parser.parse_args(argv)
+
+    relative_paths = [
+        sprite_filepath_build("pokemon", pokemon_id, **SPRITE_VARIANTS[variant])
+        for pokemon_id in range(args.first, args.last + 1)
+        for variant in args.variants
+    ]
+
+    async def run():
+        async with create_http_client() as client:
+            return await prefetch_sprites(client, relative_paths, args.concurrency)
+
+    console = Console()
+    started = time.perf_counter()
+    counts = asyncio.run(run())
+    console.print(
+        f"[bold green]Sprites:[/bold green] {counts['fetched']} fetched, {counts['cached']} already cached, "
+        f"{counts['missing']} missing upstream, {counts['failed']} failed in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
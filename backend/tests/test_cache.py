@@ -0,0 +1,168 @@
+import asyncio
+import multiprocessing
+import time
+
+import httpx
+import pytest
+
+from backend import cache as cache_module
+from backend.cache import DiskStore, LRUCache, TieredCache
+from backend.helper_functions import fetch_upstream, wait_for_fill
+
+URL = "https://pokeapi.co/api/v2/pokemon/pikachu/"
+KEY = "pokemon/pikachu/"
+WORKERS = 4
+
+
+def shared_cache(path) -> TieredCache:
+    """returns one worker's view of the shared cache at `path`"""
+    return TieredCache(LRUCache(64, 3600), DiskStore(str(path), 3600), shared=True)
+
+
+@pytest.fixture
+def caches(tmp_path):
+    caches = [shared_cache(tmp_path / "cache.db") for _ in range(WORKERS)]
+    yield caches
+    for cache in caches:
+        cache.close()
+
+
+def test_one_of_concurrent_claims_wins(caches):
+    async def claim_all():
+        return await asyncio.gather(*(cache.claim_fill(KEY) for cache in caches))
+
+    claims = asyncio.run(claim_all())
+    assert claims.count(True) == 1
+    assert all(cache.filling(KEY) for cache in caches)
+
+
+def test_released_lease_can_be_claimed_again(caches):
+    async def run():
+        filler, other = caches[0], caches[1]
+        assert await filler.claim_fill(KEY)
+        assert not await other.claim_fill(KEY)
+        await filler.release_fill(KEY)
+        assert not other.filling(KEY)
+        assert await other.claim_fill(KEY)
+
+    asyncio.run(run())
+
+
+def test_expired_lease_can_be_claimed_again(caches):
+    async def run():
+        assert await caches[0].claim_fill(KEY, seconds=0.05)
+        assert not await caches[1].claim_fill(KEY)
+        await asyncio.sleep(0.1)
+        # The filler died without releasing it
+        assert not caches[1].filling(KEY)
+        assert await caches[1].claim_fill(KEY)
+
+    asyncio.run(run())
+
+
+def test_waiters_read_the_fillers_entry(caches):
+    async def worker(cache):
+        if await cache.claim_fill(KEY):
+            await asyncio.sleep(0.1)
+            await cache.aset(KEY, {"name": "pikachu"})
+            await cache.release_fill(KEY)
+            return "filled"
+        return await wait_for_fill(cache, KEY, 0.0)
+
+    async def run():
+        return await asyncio.gather(*(worker(cache) for cache in caches))
+
+    results = asyncio.run(run())
+    assert results.count("filled") == 1
+    assert [result for result in results if result != "filled"] == [{"name": "pikachu"}] * (WORKERS - 1)
+    assert sorted(cache.fills_shared for cache in caches) == [0] + [1] * (WORKERS - 1)
+
+
+def test_waiters_stop_waiting_when_the_filler_stores_nothing(caches):
+    filler, waiters = caches[0], caches[1:]
+
+    async def run():
+        assert await filler.claim_fill(KEY)
+        waiting = asyncio.gather(*(wait_for_fill(waiter, KEY, 0.0) for waiter in waiters))
+        await asyncio.sleep(0.1)
+        await filler.release_fill(KEY)
+        started = time.monotonic()
+        results = await waiting
+        return results, time.monotonic() - started
+
+    results, waited = asyncio.run(run())
+    assert results == [None] * len(waiters)
+    assert waited < 1
+
+
+def fetch_in_worker(path, upstream_calls, start, results):
+    """One worker process: fetches URL through the shared cache at `path` from a slow upstream."""
+    cache_module._response_cache = shared_cache(path)
+
+    async def upstream(request):
+        with upstream_calls.get_lock():
+            upstream_calls.value += 1
+        await asyncio.sleep(0.3)
+        return httpx.Response(200, json={"name": "pikachu"})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+            return await fetch_upstream(client, URL, seen=0.0)
+
+    start.wait()
+    results.put(asyncio.run(run()))
+
+
+def test_one_worker_fetches_while_the_others_wait(tmp_path):
+    context = multiprocessing.get_context("fork")
+    upstream_calls = context.Value("i", 0)
+    start = context.Event()
+    results = context.Queue()
+    path = tmp_path / "cache.db"
+    DiskStore(str(path), 3600).close()
+
+    workers = [
+        context.Process(target=fetch_in_worker, args=(path, upstream_calls, start, results))
+        for _ in range(WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    start.set()
+    answers = [results.get(timeout=10) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=10)
+
+    assert answers == [{"name": "pikachu"}] * WORKERS
+    assert upstream_calls.value == 1
+
+
+def test_invalidate_drops_other_workers_memory_tier(caches):
+    writer, reader = caches[0], caches[1]
+    writer.set(KEY, {"name": "pikachu"})
+    writer.set("pokemon/eevee/", {"name": "eevee"})
+    assert reader.get(KEY) == {"name": "pikachu"}
+    assert reader.get("pokemon/eevee/") == {"name": "eevee"}
+    generation = writer.disk.generation()
+
+    asyncio.run(writer.invalidate(key=KEY))
+
+    assert writer.disk.generation() == generation + 1
+    # The reader still held both in its memory tier; the new generation makes it drop them
+    assert reader.get(KEY) is None
+    assert reader.get("pokemon/eevee/") == {"name": "eevee"}
+
+    asyncio.run(writer.invalidate())
+
+    assert reader.get("pokemon/eevee/") is None
+
+
+def test_expired_entries_are_skipped_until_purged(tmp_path):
+    cache = TieredCache(LRUCache(64, 3600), DiskStore(str(tmp_path / "cache.db"), 0.05))
+    cache.disk.set(KEY, {"name": "pikachu"}, time.time())
+    assert cache.disk.get_entry(KEY) is not None
+    time.sleep(0.1)
+
+    assert cache.disk.get_entry(KEY) is None
+    assert asyncio.run(cache.purge_expired()) == 1
+    assert asyncio.run(cache.purge_expired()) == 0
+    cache.close()
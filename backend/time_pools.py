@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import random
+
+import httpx
+
+from .common import TIME_POOL_REFRESH_INTERVAL, TIME_POOL_SIZE, TIME_TYPE_POOLS, api_url_build
+from .helper_functions import fan_out, fetch_json, fetch_pokemon_data
+from .indexes import get_pokedex_index
+from .records import PokemonRecord
+
+logger = logging.getLogger(__name__)
+
+# type -> hydrated Pokemon of that type, ready for /pokemon-by-time to sample
+_time_pools = {}
+
+
+async def hydrate_type_pool(client: httpx.AsyncClient, type_name: str, size: int = TIME_POOL_SIZE) -> list[PokemonRecord]:
+    """
+    Hydrates up to `size` Pokemon of one type.
+
+    Uses the Pokedex index when one is loaded; otherwise fetches the type
+    listing and a random sample of its Pokemon (through the response cache).
+    """
+    index = get_pokedex_index()
+    if index is not None:
+        pokemon_list = index.records(index.query(type_name=type_name))
+        return random.sample(pokemon_list, min(size, len(pokemon_list)))
+
+    type_data = await fetch_json(client, api_url_build("type", type_name))
+    pokemon_entries = type_data.get("pokemon", [])
+    selected_entries = random.sample(pokemon_entries, min(size, len(pokemon_entries)))
+    return await fan_out(
+        [api_url_build("pokemon", entry["pokemon"]["name"]) for entry in selected_entries],
+        lambda url: fetch_pokemon_data(client, url),
+        deadline=None,
+    )
+
+
+async def warm_time_pools(client: httpx.AsyncClient):
+    """(Re)builds the pool for every type in TIME_TYPE_POOLS, keeping the old pool on failure."""
+    type_names = [type_name for pool in TIME_TYPE_POOLS.values() for type_name in pool]
+
+    async def warm(type_name):
+        try:
+            pokemon_list = await hydrate_type_pool(client, type_name)
+        except httpx.HTTPError as e:
+            logger.warning("Could not warm %s pool: %s", type_name, e)
+            return
+        if pokemon_list:
+            _time_pools[type_name] = pokemon_list
+
+    await asyncio.gather(*(warm(type_name) for type_name in type_names))
+    logger.info("Time-of-day pools warm: %d of %d types", len(_time_pools), len(type_names))
+
+
+async def run_time_pool_warmer(client: httpx.AsyncClient, interval: float = TIME_POOL_REFRESH_INTERVAL):
+    """Warms the pools at startup, then re-hydrates them every `interval` seconds until cancelled."""
+    while True:
+        try:
+            await warm_time_pools(client)
+        except Exception as e:
+            logger.error("Time pool warm-up failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+def sample_time_pool(type_name: str, k: int) -> list[PokemonRecord]:
+    """
+    Samples `k` Pokemon from a warm pool.
+
+    Returns:
+        list[PokemonRecord]: The sampled Pokemon, or an empty list if the pool isn't warm yet
+    """
+    pool = _time_pools.get(type_name, [])
+    return random.sample(pool, min(k, len(pool)))
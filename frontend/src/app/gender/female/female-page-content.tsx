@@ -11,6 +11,8 @@ import React, { useState, useEffect } from "react";
 
 interface FemalePageContentProps {
   initialTypes: string[];
+  // Loaded alongside the types; fetched on demand when missing
+  initialRoles?: PokemonRole | null;
 }
 
 interface PokemonRole {
@@ -19,6 +21,7 @@ interface PokemonRole {
 
 const FemalePageContent: React.FC<FemalePageContentProps> = ({
   initialTypes,
+  initialRoles,
 }) => {
   const searchParams = useSearchParams();
   const [selectedType, setSelectedType] = useState<string>("");
@@ -37,7 +40,8 @@ const FemalePageContent: React.FC<FemalePageContentProps> = ({
     if (viewMode === "roles") {
       const fetchRoles = async () => {
         setIsLoading(true);
-        const roles = (await getPokemonRoles("female")) as PokemonRole;
+        const roles =
+          initialRoles ?? ((await getPokemonRoles("female")) as PokemonRole);
         // Transform the object into an array of role objects
         const rolesArray = roles
           ? Object.entries(roles).map(([name, pokemon]) => ({
@@ -51,7 +55,7 @@ const FemalePageContent: React.FC<FemalePageContentProps> = ({
       };
       fetchRoles();
     }
-  }, [viewMode]);
+  }, [viewMode, initialRoles]);
 
   const handleTypeSelect = async (type: string) => {
     setIsLoading(true);
@@ -1,10 +1,10 @@
-import { getAvailableTypes } from "@/lib/services/api.service";
+import { getGenderOverview } from "@/lib/services/api.service";
 import FemalePageContent from "./female-page-content";
 
 const FemalePage = async () => {
-  const initialTypes = await getAvailableTypes("female");
+  const { types, roles } = await getGenderOverview("female");
 
-  return <FemalePageContent initialTypes={initialTypes || []} />;
+  return <FemalePageContent initialTypes={types} initialRoles={roles} />;
 };
 
 export default FemalePage;
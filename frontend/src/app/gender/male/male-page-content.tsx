@@ -11,13 +11,18 @@ import React, { useState, useEffect } from "react";
 
 interface MalePageContentProps {
   initialTypes: string[];
+  // Loaded alongside the types; fetched on demand when missing
+  initialRoles?: PokemonRole | null;
 }
 
 interface PokemonRole {
   [key: string]: Array<{ name: string }>;
 }
 
-const MalePageContent: React.FC<MalePageContentProps> = ({ initialTypes }) => {
+const MalePageContent: React.FC<MalePageContentProps> = ({
+  initialTypes,
+  initialRoles,
+}) => {
   const searchParams = useSearchParams();
   const [selectedType, setSelectedType] = useState<string>("");
   const [isLoading, setIsLoading] = useState(false);
@@ -35,7 +40,8 @@ const MalePageContent: React.FC<MalePageContentProps> = ({ initialTypes }) => {
     if (viewMode === "roles") {
       const fetchRoles = async () => {
         setIsLoading(true);
-        const roles = (await getPokemonRoles("male")) as PokemonRole;
+        const roles =
+          initialRoles ?? ((await getPokemonRoles("male")) as PokemonRole);
         // Transform the object into an array of role objects
         const rolesArray = roles
           ? Object.entries(roles).map(([name, pokemon]) => ({
@@ -49,7 +55,7 @@ const MalePageContent: React.FC<MalePageContentProps> = ({ initialTypes }) => {
       };
       fetchRoles();
     }
-  }, [viewMode]);
+  }, [viewMode, initialRoles]);
 
   const handleTypeSelect = async (type: string) => {
     setIsLoading(true);
@@ -1,10 +1,10 @@
-import { getAvailableTypes } from "@/lib/services/api.service";
+import { getGenderOverview } from "@/lib/services/api.service";
 import MalePageContent from "./male-page-content";
 
 const MalePage = async () => {
-  const initialTypes = await getAvailableTypes("male");
+  const { types, roles } = await getGenderOverview("male");
 
-  return <MalePageContent initialTypes={initialTypes || []} />;
+  return <MalePageContent initialTypes={types} initialRoles={roles} />;
 };
 
 export default MalePage;
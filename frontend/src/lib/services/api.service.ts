@@ -2,9 +2,15 @@ import { Pokemon } from '@/types/pokemon';
 
 const API_URL = "http://127.0.0.1:8000"
 
+// Only ask the backend for what the pages render: card lists never show stats,
+// the roles view only lists names, and the time page shows name, types and sprite.
+const CARD_FIELDS = "fields=name,types,abilities,sprite";
+const ROLE_FIELDS = "fields=name";
+const TIME_FIELDS = "fields=name,types,sprite";
+
 export const fetchPokemonByGender = async (gender: string): Promise<Pokemon[] | null> => {
   try {
-    const res = await fetch(`${API_URL}/pokemon-by-gender/${gender}`);
+    const res = await fetch(`${API_URL}/pokemon-by-gender/${gender}?${CARD_FIELDS}`);
     if (!res.ok) throw new Error(`Failed to fetch Pokémon for ${gender}`);
     
     const data = await res.json();
@@ -17,7 +23,7 @@ export const fetchPokemonByGender = async (gender: string): Promise<Pokemon[] |
 
 export const filterPokemonByType = async (gender: string, type: string) => {
   try {
-    const res = await fetch(`${API_URL}/pokemon-by-gender/${gender}/filter/${type}`);
+    const res = await fetch(`${API_URL}/pokemon-by-gender/${gender}/filter/${type}?${CARD_FIELDS}`);
     if (!res.ok) throw new Error(`Failed to filter ${gender} Pokémon by ${type}`);
     
     const data = await res.json();
@@ -41,9 +47,36 @@ export const getAvailableTypes = async (gender: string) => {
   }
 };
 
+// Everything a gender page shows up front, in one round trip: the backend
+// answers all the queries from a single fetch of the gender's Pokémon.
+export const getGenderOverview = async (gender: string) => {
+  try {
+    const res = await fetch(`${API_URL}/batch`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        queries: {
+          types: { kind: "available-types", gender },
+          roles: { kind: "pokemon-roles", gender, fields: "name" },
+        },
+      }),
+    });
+    if (!res.ok) throw new Error(`Failed to fetch overview for ${gender}`);
+
+    const { results } = await res.json();
+    return {
+      types: Array.isArray(results.types) ? results.types : [],
+      roles: results.roles?.error ? null : results.roles,
+    };
+  } catch (error) {
+    console.error("Error fetching gender overview:", error);
+    return { types: [], roles: null };
+  }
+};
+
 export const getPokemonByType = async (type: string) => {
   try {
-    const res = await fetch(`${API_URL}/pokemon-by-type/${type}`);
+    const res = await fetch(`${API_URL}/pokemon-by-type/${type}?${CARD_FIELDS}`);
     if (!res.ok) throw new Error(`Failed to fetch Pokémon of type ${type}`);
     
     const data = await res.json();
@@ -56,7 +89,7 @@ export const getPokemonByType = async (type: string) => {
 
 export const getPokemonRoles = async (gender: string) => {
   try {
-    const res = await fetch(`${API_URL}/pokemon-roles/${gender}`);
+    const res = await fetch(`${API_URL}/pokemon-roles/${gender}?${ROLE_FIELDS}`);
     if (!res.ok) throw new Error(`Failed to fetch Pokémon roles for ${gender}`);
     
     const data = await res.json();
@@ -82,7 +115,7 @@ export const getAvailableAbilities = async (type: string) => {
 
 export const filterPokemonByAbility = async (type: string, ability: string) => {
   try {
-    const res = await fetch(`${API_URL}/pokemon-by-type/${type}/filter/${ability}`);
+    const res = await fetch(`${API_URL}/pokemon-by-type/${type}/filter/${ability}?${CARD_FIELDS}`);
     if (!res.ok) throw new Error(`Failed to filter ${type} Pokémon by ${ability}`);
     
     const data = await res.json();
@@ -95,7 +128,7 @@ export const filterPokemonByAbility = async (type: string, ability: string) => {
 
 export const getTimeBasedPokemon = async () => {
   try {
-    const res = await fetch(`${API_URL}/pokemon-by-time`);
+    const res = await fetch(`${API_URL}/pokemon-by-time?${TIME_FIELDS}`);
     if (!res.ok) {
       console.error("API Error:", await res.text());
       return {
@@ -2,6 +2,6 @@ export interface Pokemon {
   name: string;
   types: string[];
   abilities: string[];
-  stats: Record<string, number>;
+  stats?: Record<string, number>;  // only sent when requested through `fields`
   sprite: string;
 }
\ No newline at end of file